@@ -5,15 +5,46 @@
 Clash Verge Adobe屏蔽模块 - 提供Adobe屏蔽相关功能
 """
 
+import os
+import re
+import time
+import base64
+import select
+import socket
+import http.client
+import urllib.parse
 import urllib.request
 import urllib.error
 
 # 导入核心模块
 from clash_verge_core import (
     find_global_script,
-    backup_file
+    backup_file,
+    script_lock,
+    replace_script,
+    check_cancelled,
+    OperationCancelled,
+    emit_event,
+    event_phase,
+    print_event,
+    EVENT_LOG,
+    EVENT_MIRROR_STARTED,
+    EVENT_MIRROR_FAILED,
+    EVENT_BYTES_RECEIVED,
+    EVENT_DOMAINS_PARSED,
+    EVENT_SCRIPT_WRITTEN
 )
 
+# 导入域名过滤模块
+from clash_verge_filter import (
+    DomainFilter,
+    DEFAULT_FILTER,
+    load_vendor_rules
+)
+
+# 导入失效域名剔除模块
+from clash_verge_prune import prune_dead_domains
+
 # 内置的Adobe域名列表
 BUILTIN_ADOBE_DOMAINS = [
     "activate.adobe.com",
@@ -39,6 +70,12 @@ BUILTIN_ADOBE_DOMAINS = [
     "www.adobeereg.com"
 ]
 
+# 生成脚本的首行，用于识别由本工具生成的脚本
+SCRIPT_HEADER = "// Adobe屏蔽规则 - 由 clash_verge_adobe_block.py 生成"
+
+# 匹配生成脚本中的规则字符串
+SCRIPT_RULE_PATTERN = re.compile(r'"([A-Z-]+,[^",]+,[A-Z]+)"')
+
 # 内置的GitHub代理列表
 GITHUB_PROXIES = [
     "https://raw.githubusercontent.com",  # 原始地址
@@ -47,76 +84,339 @@ GITHUB_PROXIES = [
     "https://mirror.ghproxy.com/https://raw.githubusercontent.com"
 ]
 
-def try_download_with_proxies():
-    """尝试使用内置代理下载"""
+# 下载时每次读取的字节数
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# 单个镜像连接/读取的超时时间（秒）
+DOWNLOAD_TIMEOUT = 15
+
+# 建立连接时检查取消的间隔（秒）
+CONNECT_POLL_INTERVAL = 0.1
+
+# 最多跟随的重定向次数
+MAX_REDIRECTS = 5
+
+# 下载请求的User-Agent
+DOWNLOAD_USER_AGENT = "disadober"
+
+def read_response(response, url, on_event=None, cancel_token=None):
+    """分块读取响应内容，并发送已接收字节数事件"""
+    total = response.headers.get("Content-Length")
+    total = int(total) if total and total.isdigit() else None
+    received = 0
+    chunks = []
+    while True:
+        check_cancelled(cancel_token)
+        chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        received += len(chunk)
+        emit_event(on_event, EVENT_BYTES_RECEIVED, url=url, received=received, total=total)
+    # 连接被取消回调关闭时，读取可能表现为正常结束
+    check_cancelled(cancel_token)
+    return b"".join(chunks).decode('utf-8')
+
+def shutdown_socket(fd):
+    """关闭套接字的读写方向，使其他线程中阻塞的握手或读取立即返回
+    
+    按文件描述符操作：TLS握手时原套接字对象会被分离，但描述符不变。
+    """
+    try:
+        sock = socket.socket(fileno=fd)
+    except OSError:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    finally:
+        sock.detach()
+
+def connect_cancellable(address, timeout, source_address=None, cancel_token=None):
+    """建立TCP连接，等待连接期间按CONNECT_POLL_INTERVAL检查取消
+    
+    连接建立后套接字会注册到cancel_token，取消时关闭读写方向，
+    之后阻塞中的TLS握手、请求和读取都会立即结束。
+    
+    返回:
+        (套接字, 注销取消回调的函数)
+    """
+    host, port = address
+    error = None
+    for family, sock_type, proto, _, sockaddr in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM):
+        check_cancelled(cancel_token)
+        sock = socket.socket(family, sock_type, proto)
+        try:
+            if source_address:
+                sock.bind(source_address)
+            sock.setblocking(False)
+            deadline = time.monotonic() + timeout
+            if sock.connect_ex(sockaddr) != 0:
+                while True:
+                    check_cancelled(cancel_token)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise socket.timeout(f"连接 {host}:{port} 超时")
+                    _, writable, failed = select.select([], [sock], [sock], min(remaining, CONNECT_POLL_INTERVAL))
+                    if writable or failed:
+                        break
+                code = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if code != 0:
+                    raise OSError(code, f"无法连接到 {host}:{port}: {os.strerror(code)}")
+            sock.settimeout(timeout)
+        except OperationCancelled:
+            sock.close()
+            raise
+        except OSError as e:
+            sock.close()
+            error = e
+            continue
+        
+        fd = sock.fileno()
+        unregister = cancel_token.register(lambda: shutdown_socket(fd)) if cancel_token else (lambda: None)
+        return sock, unregister
+    raise error or OSError(f"无法解析 {host}")
+
+class CancellableHTTPConnection(http.client.HTTPConnection):
+    """通过connect_cancellable建立连接的HTTPConnection
+    
+    cancel_token: 建立连接、等待响应和读取期间都可以取消
+    tunnel_proxy: (代理主机, 代理端口, 请求头)，不为None时先连接代理，
+                  再用CONNECT建立到host:port的隧道
+    """
+    cancel_token = None
+    tunnel_proxy = None
+    unregister_cancel = None
+    
+    def connect(self):
+        address = self.tunnel_proxy[:2] if self.tunnel_proxy else (self.host, self.port)
+        self.sock, self.unregister_cancel = connect_cancellable(
+            address, self.timeout, self.source_address, self.cancel_token)
+        try:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass
+        if self.tunnel_proxy:
+            self.open_tunnel()
+    
+    def open_tunnel(self):
+        """向代理发送CONNECT请求，代理返回非200状态码时抛出OSError"""
+        target = f"{self.host}:{self.port}"
+        lines = [f"CONNECT {target} HTTP/1.0", f"Host: {target}"]
+        lines += [f"{name}: {value}" for name, value in self.tunnel_proxy[2].items()]
+        self.sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+        
+        response = http.client.HTTPResponse(self.sock, method="CONNECT")
+        try:
+            response.begin()
+            if response.status != 200:
+                raise OSError(f"代理隧道建立失败: {response.status} {response.reason}")
+        finally:
+            response.close()
+    
+    def close(self):
+        # 先注销取消回调，再关闭连接释放描述符
+        if self.unregister_cancel is not None:
+            self.unregister_cancel()
+            self.unregister_cancel = None
+        super().close()
+
+class CancellableHTTPSConnection(http.client.HTTPSConnection, CancellableHTTPConnection):
+    """通过connect_cancellable建立连接的HTTPSConnection
+    
+    HTTPSConnection.connect()先调用CancellableHTTPConnection.connect()建立TCP连接
+    （和代理隧道），再以host为服务器名称进行TLS握手。
+    """
+
+def parse_proxy(proxy):
+    """解析代理地址，返回(主机, 端口, 认证请求头)
+    
+    没有端口时按代理的协议使用默认端口，地址中带有用户名和密码时生成
+    Basic认证的Proxy-Authorization请求头。
+    """
+    proxy_parts = urllib.parse.urlsplit(proxy if "://" in proxy else "http://" + proxy)
+    port = proxy_parts.port or (443 if proxy_parts.scheme == "https" else 80)
+    headers = {}
+    if proxy_parts.username is not None:
+        credentials = "{}:{}".format(urllib.parse.unquote(proxy_parts.username),
+                                     urllib.parse.unquote(proxy_parts.password or ""))
+        headers["Proxy-Authorization"] = "Basic " + base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+    return proxy_parts.hostname, port, headers
+
+def open_url(url, cancel_token=None, timeout=DOWNLOAD_TIMEOUT):
+    """发送GET请求并跟随重定向，返回(连接, 响应)，连接由调用方关闭
+    
+    直接使用http.client而不是urlopen()，使连接在建立之前就能被取消：
+    阻塞中的连接、TLS握手和等待响应头都会因cancel_token而立即结束。
+    与urlopen()相同，会使用环境变量中配置的HTTP代理（包括代理认证）。
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise urllib.error.URLError(f"不支持的URL: {url}")
+        https = parts.scheme == "https"
+        port = parts.port or (443 if https else 80)
+        path = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        headers = {"User-Agent": DOWNLOAD_USER_AGENT}
+        
+        proxy = urllib.request.getproxies().get(parts.scheme)
+        if proxy and urllib.request.proxy_bypass(parts.hostname):
+            proxy = None
+        if https:
+            conn = CancellableHTTPSConnection(parts.hostname, port, timeout=timeout)
+            if proxy:
+                conn.tunnel_proxy = parse_proxy(proxy)
+        elif proxy:
+            proxy_host, proxy_port, proxy_headers = parse_proxy(proxy)
+            conn = CancellableHTTPConnection(proxy_host, proxy_port, timeout=timeout)
+            headers.update(proxy_headers)
+            path = url
+        else:
+            conn = CancellableHTTPConnection(parts.hostname, port, timeout=timeout)
+        conn.cancel_token = cancel_token
+        
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+        except BaseException:
+            conn.close()
+            raise
+        
+        location = response.getheader("Location")
+        if response.status in (301, 302, 303, 307, 308) and location:
+            conn.close()
+            url = urllib.parse.urljoin(url, location)
+            continue
+        return conn, response
+    raise urllib.error.URLError(f"重定向次数过多: {url}")
+
+def download_vendor_domains(url, domain_filter=None, on_event=None, cancel_token=None):
+    """从指定URL下载并按厂商规则解析域名，失败时抛出异常
+    
+    返回:
+        {厂商: [域名, ...]}，只包含至少有一个域名的厂商
+    
+    取消时会立即关闭连接，使阻塞中的连接、握手或读取返回，并抛出OperationCancelled。
+    """
+    if domain_filter is None:
+        domain_filter = DEFAULT_FILTER
+    
+    check_cancelled(cancel_token)
+    try:
+        conn, response = open_url(url, cancel_token)
+        try:
+            if response.status != 200:
+                raise urllib.error.URLError(f"HTTP状态码 {response.status}")
+            content = read_response(response, url, on_event, cancel_token)
+        finally:
+            conn.close()
+    except OperationCancelled:
+        raise
+    except Exception:
+        # 连接被取消回调关闭时，读取会以任意异常结束
+        check_cancelled(cancel_token)
+        raise
+    
+    vendor_domains = domain_filter.extract(content)
+    counts = {vendor: len(domains) for vendor, domains in vendor_domains.items()}
+    summary = "，".join(f"{vendor} {count} 个" for vendor, count in counts.items()) or "0 个"
+    emit_event(on_event, EVENT_DOMAINS_PARSED, f"解析到需要屏蔽的域名: {summary}",
+               url=url, count=sum(counts.values()), counts=counts)
+    return vendor_domains
+
+def try_download_vendor_domains_with_proxies(domain_filter=None, on_event=None, cancel_token=None, proxies=None):
+    """尝试使用内置代理下载并按厂商规则解析，返回(厂商域名字典或None, 尝试过的URL)
+    
+    proxies可以指定尝试代理的顺序，默认为GITHUB_PROXIES。
+    """
     tried_urls = []
-    for proxy in GITHUB_PROXIES:
+    for proxy in proxies or GITHUB_PROXIES:
         url = f"{proxy}/ignaciocastro/a-dove-is-dumb/main/127.txt"
         tried_urls.append(url)
-        print(f"尝试使用代理URL: {url}")
+        emit_event(on_event, EVENT_MIRROR_STARTED, f"尝试使用代理URL: {url}", proxy=proxy, url=url)
         try:
-            with urllib.request.urlopen(url) as response:
-                if response.status == 200:
-                    content = response.read().decode('utf-8')
-                    domains = extract_adobe_domains(content)
-                    if domains:
-                        return domains, tried_urls
+            vendor_domains = download_vendor_domains(url, domain_filter, on_event, cancel_token)
+            if not vendor_domains:
+                # 返回了内容但没有可用的域名（例如错误页面），同样视为该代理失败
+                raise ValueError("下载的名单中没有需要屏蔽的域名")
+            return vendor_domains, tried_urls
+        except OperationCancelled:
+            raise
         except Exception as e:
-            print(f"通过代理 {proxy} 下载失败: {e}")
+            emit_event(on_event, EVENT_MIRROR_FAILED, f"通过代理 {proxy} 下载失败: {e}",
+                       proxy=proxy, url=url, error=e)
     
-    print("所有内置代理均下载失败")
+    emit_event(on_event, EVENT_LOG, "所有内置代理均下载失败")
     return None, tried_urls
 
-def try_download_with_custom_proxy(proxy):
+def try_download_with_proxies(on_event=None, cancel_token=None):
+    """尝试使用内置代理下载"""
+    vendor_domains, tried_urls = try_download_vendor_domains_with_proxies(None, on_event, cancel_token)
+    if not vendor_domains:
+        return None, tried_urls
+    return vendor_domains.get("adobe"), tried_urls
+
+def try_download_with_custom_proxy(proxy, on_event=None, cancel_token=None):
     """尝试使用用户自定义代理下载"""
     if not proxy.endswith('/'):
         proxy += '/'
     
     url = f"{proxy}https://raw.githubusercontent.com/ignaciocastro/a-dove-is-dumb/main/127.txt"
+    emit_event(on_event, EVENT_MIRROR_STARTED, f"尝试使用自定义代理: {url}", proxy=proxy, url=url)
     
     try:
-        with urllib.request.urlopen(url) as response:
-            if response.status == 200:
-                content = response.read().decode('utf-8')
-                domains = extract_adobe_domains(content)
-                if domains:
-                    return domains
-    except Exception:
-        pass
+        domains = download_vendor_domains(url, None, on_event, cancel_token).get("adobe")
+        if not domains:
+            raise ValueError("下载的名单中没有需要屏蔽的域名")
+        return domains
+    except OperationCancelled:
+        raise
+    except Exception as e:
+        emit_event(on_event, EVENT_MIRROR_FAILED, f"通过自定义代理 {proxy} 下载失败: {e}",
+                   proxy=proxy, url=url, error=e)
     
     return None
 
 def extract_adobe_domains(content):
     """从下载内容中提取Adobe相关域名"""
-    domains = []
-    for line in content.splitlines():
-        line = line.strip()
-        if line and line.startswith("127.0.0.1 "):
-            domain = line.split(" ")[1]
-            if "adobe" in domain.lower():
-                domains.append(domain)
-    return domains
-
-def download_adobe_block_list():
-    """下载Adobe屏蔽名单"""
+    return DEFAULT_FILTER.extract(content).get("adobe", [])
+
+def download_vendor_block_lists(domain_filter=None, on_event=None, cancel_token=None, proxies=None):
+    """下载屏蔽名单并按厂商规则解析，返回厂商域名字典或None"""
     # 依次尝试各个代理
-    domains, tried_urls = try_download_with_proxies()
-    if domains:
-        return domains
+    with event_phase(on_event, "download"):
+        vendor_domains, tried_urls = try_download_vendor_domains_with_proxies(domain_filter, on_event,
+                                                                              cancel_token, proxies)
+    if vendor_domains:
+        return vendor_domains
     
-    # 如果内置代理都失败，打印尝试过的URL
-    print("\n已尝试过以下代理URL:")
-    for url in tried_urls:
-        print(f"- {url}")
-    print()
+    # 如果内置代理都失败，报告尝试过的URL
+    lines = ["已尝试过以下代理URL:"] + [f"- {url}" for url in tried_urls]
+    emit_event(on_event, EVENT_LOG, "\n".join(lines), tried_urls=tried_urls)
     
     # 如果内置代理都失败，返回None
     return None
 
-def create_adobe_block_script(domains):
-    """创建Adobe屏蔽脚本"""
+def download_adobe_block_list(on_event=None, cancel_token=None):
+    """下载Adobe屏蔽名单"""
+    vendor_domains = download_vendor_block_lists(None, on_event, cancel_token)
+    if not vendor_domains:
+        return None
+    return vendor_domains.get("adobe")
+
+def create_adobe_block_script(domains, vendor_domains=None):
+    """创建Adobe屏蔽脚本
+    
+    参数:
+        domains: Adobe域名列表
+        vendor_domains: 可选的其他厂商域名字典{厂商: [域名, ...]}
+    
+    Adobe域名按DEFAULT_FILTER筛选，与自定义厂商规则无关；其他厂商列表中
+    符合Adobe规则的域名（自定义规则与Adobe规则重叠时）归入Adobe规则。
+    """
     # 安全的脚本模板
-    script_template = """// Adobe屏蔽规则 - 由 clash_verge_adobe_block.py 生成
+    script_template = SCRIPT_HEADER + """
 function main(config) {
   // 确保配置对象存在
   if (!config) {
@@ -138,7 +438,7 @@ function main(config) {
   adobe_rules.push("DOMAIN-SUFFIX,adobestats.io,REJECT");
   
   // Adobe屏蔽规则 - 从屏蔽列表生成
-%s
+%s%s
   
   // 将规则添加到配置的开头
   config.rules = adobe_rules.concat(config.rules);
@@ -147,21 +447,57 @@ function main(config) {
 }
 """
     
+    # 其他厂商列表中符合Adobe规则的域名归入Adobe规则
+    adobe_domains = list(domains)
+    other_vendors = {}
+    for vendor, vendor_list in (vendor_domains or {}).items():
+        if vendor == "adobe":
+            continue
+        other_vendors[vendor] = []
+        for domain in vendor_list:
+            if DEFAULT_FILTER.match(domain) == "adobe":
+                adobe_domains.append(domain)
+            else:
+                other_vendors[vendor].append(domain)
+    
     # 生成域名规则代码
     domain_rules = []
-    for domain in domains:
-        if "adobe" in domain.lower() and "adobe.io" not in domain:
+    for domain in dict.fromkeys(adobe_domains):
+        if DEFAULT_FILTER.match(domain) == "adobe" and "adobe.io" not in domain:
             domain_rules.append(f'  adobe_rules.push("DOMAIN-SUFFIX,{domain},REJECT");')
     
+    # 生成其他厂商的域名规则代码
+    vendor_rules = []
+    for vendor, vendor_list in other_vendors.items():
+        if not vendor_list:
+            continue
+        vendor_rules.append(f"  \n  // {vendor}屏蔽规则 - 从屏蔽列表生成")
+        for domain in vendor_list:
+            vendor_rules.append(f'  adobe_rules.push("DOMAIN-SUFFIX,{domain},REJECT");')
+    
     # 插入域名规则
     domain_rules_str = "\n".join(domain_rules)
-    return script_template % domain_rules_str
+    vendor_rules_str = "".join("\n" + line for line in vendor_rules)
+    return script_template % (domain_rules_str, vendor_rules_str)
+
+def extract_script_rules(script_text):
+    """从本工具生成的脚本中按插入顺序提取规则，其他脚本返回None"""
+    if not script_text.startswith(SCRIPT_HEADER):
+        return None
+    return SCRIPT_RULE_PATTERN.findall(script_text)
 
-def modify_clash_verge_script(domains=None):
+def modify_clash_verge_script(domains=None, on_event=None, cancel_token=None, domain_filter=None,
+                              vendor_domains=None, prune=False, resolver=None):
     """修改Clash Verge脚本添加Adobe屏蔽规则
     
     参数:
         domains: 可选的域名列表，如果为None则会尝试下载
+        on_event: 可选的进度事件回调，接收ProgressEvent
+        cancel_token: 可选的CancelToken，取消时抛出OperationCancelled
+        domain_filter: 可选的DomainFilter，下载时同时按其中的其他厂商规则生成屏蔽规则
+        vendor_domains: 可选的其他厂商域名字典，与domains一起提供时使用
+        prune: 是否在生成脚本前剔除多次确认无法解析的域名
+        resolver: 剔除时使用的解析器，默认使用系统解析器
         
     返回:
         (成功状态, 信息消息)
@@ -174,35 +510,95 @@ def modify_clash_verge_script(domains=None):
         
         # 如果没有提供域名列表，尝试下载
         if domains is None:
-            domains = download_adobe_block_list()
+            vendor_domains = download_vendor_block_lists(domain_filter, on_event, cancel_token) or {}
+            domains = vendor_domains.get("adobe")
             if not domains:
+                emit_event(on_event, EVENT_LOG, "使用内置的Adobe域名列表")
                 domains = BUILTIN_ADOBE_DOMAINS
         
-        # 创建安全的脚本
-        new_script = create_adobe_block_script(domains)
+        # 剔除失效的域名
+        if prune:
+            candidates = list(domains)
+            for vendor_list in (vendor_domains or {}).values():
+                candidates.extend(vendor_list)
+            with event_phase(on_event, "prune"):
+                _, dead = prune_dead_domains(candidates, resolver=resolver, on_event=on_event,
+                                             cancel_token=cancel_token)
+            dead = set(dead)
+            domains = [domain for domain in domains if domain not in dead]
+            if vendor_domains:
+                vendor_domains = {vendor: [domain for domain in vendor_list if domain not in dead]
+                                  for vendor, vendor_list in vendor_domains.items()}
         
-        # 备份原文件
-        backup_result = backup_file(script_path)
-        if not backup_result:
-            return False, "备份文件失败"
+        # 创建安全的脚本
+        with event_phase(on_event, "render"):
+            new_script = create_adobe_block_script(domains, vendor_domains)
         
-        # 写入新脚本
-        with open(script_path, 'w', encoding='utf-8') as f:
-            f.write(new_script)
+        # 备份原文件并原子地写入新脚本，持有修改锁避免与其他程序同时修改
+        check_cancelled(cancel_token)
+        with script_lock(script_path.parent, cancel_token=cancel_token):
+            with event_phase(on_event, "backup"):
+                backup_result = backup_file(script_path, on_event=on_event)
+            if not backup_result:
+                return False, "备份文件失败"
+            
+            with event_phase(on_event, "write"):
+                replace_script(script_path, new_script)
+        emit_event(on_event, EVENT_SCRIPT_WRITTEN, f"已写入脚本: {script_path.name}",
+                   path=script_path, size=len(new_script.encode('utf-8')),
+                   rules=len(extract_script_rules(new_script)))
         
         return True, f"已成功修改脚本: {script_path.name}"
         
+    except OperationCancelled:
+        raise
     except Exception as e:
         return False, f"应用Adobe屏蔽规则时出错: {e}"
 
 if __name__ == "__main__":
     try:
+        import sys
+        from clash_verge_controller import run_with_hot_reload
+        from clash_verge_service import service_available, call_service
+        from clash_verge_metrics import record_run, parse_metrics_dir
+        
         print("Clash Verge Adobe屏蔽工具")
         print("-" * 50)
-        success, message = modify_clash_verge_script()
+        
+        # 可选参数：--reload 通过控制器热重载；--prune 剔除失效域名；
+        # --metrics-dir=目录 写入Prometheus指标；厂商规则JSON文件
+        hot_reload = "--reload" in sys.argv[1:]
+        prune = "--prune" in sys.argv[1:]
+        metrics_dir = parse_metrics_dir(sys.argv[1:])
+        args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+        
+        def run(on_event):
+            if service_available():
+                # 本地服务正在运行时由服务执行，复用其缓存的屏蔽名单和代理状态
+                print("通过本地服务应用规则")
+                params = {"hot_reload": hot_reload, "prune": prune,
+                          "rules_path": os.path.abspath(args[0]) if args else None}
+                result = call_service("apply", params, on_event=on_event)
+                return result["success"], result["message"], result["reloaded"]
+            
+            domain_filter = None
+            if args:
+                domain_filter = DomainFilter(load_vendor_rules(args[0]))
+                print(f"已加载厂商规则: {', '.join(domain_filter.vendors)}")
+            
+            return run_with_hot_reload(
+                lambda: modify_clash_verge_script(on_event=on_event, domain_filter=domain_filter, prune=prune),
+                hot_reload, on_event=on_event)
+        
+        success, message, reloaded = record_run("apply", run, metrics_dir, on_event=print_event)
+        
         if success:
-            print(f"{message}\nAdobe屏蔽规则已应用。请重启Clash Verge以生效。")
+            print(message)
+            if reloaded:
+                print("Adobe屏蔽规则已应用并立即生效。")
+            else:
+                print("Adobe屏蔽规则已应用。请重启Clash Verge以生效。")
         else:
             print(f"错误: {message}")
     except Exception as e:
-        print(f"发生错误: {e}") 
\ No newline at end of file
+        print(f"发生错误: {e}")
\ No newline at end of file
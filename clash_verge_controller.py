@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Clash Verge热重载模块 - 通过内核的external-controller接口让规则立即生效
+"""
+
+import re
+import json
+import urllib.request
+import urllib.error
+
+# 导入核心模块
+from clash_verge_core import (
+    get_clash_verge_directory,
+    find_global_script,
+    emit_event,
+    check_cancelled,
+    OperationCancelled,
+    EVENT_LOG,
+    EVENT_CONFIG_RELOADED
+)
+
+# 导入Adobe屏蔽模块
+from clash_verge_adobe_block import extract_script_rules
+
+# Clash Verge为内核生成的运行时配置，以及用户的基础配置
+RUNTIME_CONFIG_NAME = "clash-verge.yaml"
+BASE_CONFIG_NAME = "config.yaml"
+
+# 记录运行时配置中已包含的本工具规则，连续多次热重载时使用
+RELOAD_STATE_NAME = "disadober-reload.json"
+
+# 控制器请求超时时间（秒）
+CONTROLLER_TIMEOUT = 3
+
+class ControllerError(Exception):
+    """external-controller请求失败"""
+    pass
+
+def read_top_level_value(yaml_text, key):
+    """读取YAML文本中的顶层标量值，不存在时返回None"""
+    m = re.search(rf"^{re.escape(key)}:[ \t]*(.*?)[ \t]*$", yaml_text, re.MULTILINE)
+    if not m:
+        return None
+    value = m.group(1)
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        value = value[1:-1]
+    return value
+
+def find_controller_settings(config_dir=None):
+    """从本地配置中读取external-controller地址和secret
+
+    优先读取内核实际使用的运行时配置，其次是基础配置。
+
+    返回:
+        (基础URL, secret)，未配置控制器时返回(None, None)
+    """
+    if config_dir is None:
+        config_dir = get_clash_verge_directory()
+
+    for name in (RUNTIME_CONFIG_NAME, BASE_CONFIG_NAME):
+        path = config_dir / name
+        if not path.exists():
+            continue
+        text = path.read_text(encoding='utf-8')
+        address = read_top_level_value(text, "external-controller")
+        if not address:
+            continue
+
+        # 监听所有地址或省略主机时，通过本机回环地址访问
+        host, _, port = address.rpartition(":")
+        if host in ("", "0.0.0.0", "::", "[::]"):
+            host = "127.0.0.1"
+        secret = read_top_level_value(text, "secret") or ""
+        return f"http://{host}:{port}", secret
+
+    return None, None
+
+class ClashController:
+    """Clash内核external-controller REST接口的最小客户端"""
+    def __init__(self, base_url, secret="", timeout=CONTROLLER_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.secret = secret
+        self.timeout = timeout
+
+    @classmethod
+    def from_local_config(cls, config_dir=None):
+        """根据本地配置创建客户端，未配置控制器时返回None"""
+        base_url, secret = find_controller_settings(config_dir)
+        if base_url is None:
+            return None
+        return cls(base_url, secret)
+
+    def request(self, method, path, body=None):
+        """发送请求，返回解析后的JSON（无内容时返回None）"""
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        req.add_header("Content-Type", "application/json")
+        if self.secret:
+            req.add_header("Authorization", f"Bearer {self.secret}")
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                content = response.read()
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode('utf-8', errors='replace').strip()
+            raise ControllerError(f"{method} {path} 返回 {e.code}: {detail}")
+        except Exception as e:
+            raise ControllerError(f"无法连接到控制器 {self.base_url}: {e}")
+        if not content:
+            return None
+        return json.loads(content.decode('utf-8'))
+
+    def reload_config(self, payload):
+        """用完整的YAML配置内容重载内核配置"""
+        self.request("PUT", "/configs?force=true", {"path": "", "payload": payload})
+
+    def get_rules(self):
+        """返回内核当前生效的规则列表"""
+        return self.request("GET", "/rules").get("rules", [])
+
+def parse_rule_item(line):
+    """解析YAML规则列表项，返回(缩进, 规则字符串)，不是列表项时返回None"""
+    m = re.match(r"^([ \t]*)-[ \t]+(.*?)[ \t]*$", line)
+    if not m:
+        return None
+    rule = m.group(2)
+    if len(rule) >= 2 and rule[0] == rule[-1] and rule[0] in "'\"":
+        rule = rule[1:-1]
+    return m.group(1), rule
+
+def read_config_rules(yaml_text):
+    """按顺序读取YAML配置中顶层rules列表的规则字符串"""
+    rules = []
+    in_rules = False
+    for line in yaml_text.splitlines():
+        if not in_rules:
+            in_rules = re.match(r"^rules:[ \t]*$", line) is not None
+            continue
+        if line and not line[0].isspace() and not line.startswith("-"):
+            break
+        item = parse_rule_item(line)
+        if item is not None:
+            rules.append(item[1])
+    return rules
+
+def replace_config_rules(yaml_text, new_rules, old_rules=()):
+    """在运行时配置中移除old_rules中的规则，并把new_rules插入到规则列表开头
+
+    与生成脚本中的main(config)相同，新规则位于用户规则之前。
+    """
+    lines = yaml_text.splitlines()
+    old_rules = set(old_rules)
+
+    for index, line in enumerate(lines):
+        if re.match(r"^rules:[ \t]*(\[\])?[ \t]*$", line):
+            break
+    else:
+        lines.append("rules:")
+        index = len(lines) - 1
+    lines[index] = "rules:"
+
+    # 收集规则列表的范围，并保留不属于旧规则的条目
+    end = index + 1
+    indent = None
+    kept = []
+    while end < len(lines):
+        line = lines[end]
+        if line and not line[0].isspace() and not line.startswith("-"):
+            break
+        item = parse_rule_item(line)
+        if item is not None:
+            if indent is None:
+                indent = item[0]
+            if item[1] in old_rules:
+                end += 1
+                continue
+        kept.append(line)
+        end += 1
+
+    inserted = [f"{indent or ''}- {rule}" for rule in new_rules]
+    lines[index + 1:end] = inserted + kept
+    return "\n".join(lines) + "\n"
+
+def rules_active(active_rules, expected_rules):
+    """检查内核规则列表开头是否与期望的规则一致"""
+    if len(active_rules) < len(expected_rules):
+        return False
+    for active, expected in zip(active_rules, expected_rules):
+        _, payload, target = expected.split(",", 2)
+        if active.get("payload") != payload or active.get("proxy") != target:
+            return False
+    return True
+
+def load_base_rules(config_dir, runtime_path):
+    """读取运行时配置生成时包含的本工具规则
+
+    Clash Verge重新生成运行时配置后（修改时间变化）记录失效，返回None。
+    """
+    state_path = config_dir / RELOAD_STATE_NAME
+    try:
+        state = json.loads(state_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if state.get("runtime_mtime_ns") != runtime_path.stat().st_mtime_ns:
+        return None
+    return state.get("base_rules")
+
+def save_base_rules(config_dir, runtime_path, base_rules):
+    """记录运行时配置中包含的本工具规则"""
+    state = {"runtime_mtime_ns": runtime_path.stat().st_mtime_ns, "base_rules": list(base_rules)}
+    (config_dir / RELOAD_STATE_NAME).write_text(json.dumps(state), encoding='utf-8')
+
+def read_current_script_rules():
+    """读取当前全局脚本中由本工具生成的规则，用于之后的热重载"""
+    script_path = find_global_script()
+    if not script_path or not script_path.exists():
+        return []
+    return extract_script_rules(script_path.read_text(encoding='utf-8')) or []
+
+def hot_reload_script(old_rules, on_event=None, cancel_token=None, controller=None, config_dir=None):
+    """让正在运行的内核加载当前全局脚本中的规则，无需重启Clash Verge
+
+    磁盘上的运行时配置只在Clash Verge启动或切换配置时重新生成，其中包含的是
+    当时脚本的规则。第一次热重载时用old_rules记录这些规则，之后的热重载沿用该记录，
+    因此连续多次修改后旧规则也能被正确移除。
+    
+    参数:
+        old_rules: 修改脚本前由read_current_script_rules()读取的旧规则
+        on_event: 可选的进度事件回调
+        cancel_token: 可选的CancelToken
+        controller: 可选的ClashController，默认根据本地配置创建
+        config_dir: 可选的Clash Verge配置目录
+
+    返回:
+        (成功状态, 信息消息)
+    """
+    try:
+        if config_dir is None:
+            config_dir = get_clash_verge_directory()
+        if controller is None:
+            controller = ClashController.from_local_config(config_dir)
+            if controller is None:
+                return False, "本地配置中未启用external-controller"
+
+        runtime_path = config_dir / RUNTIME_CONFIG_NAME
+        if not runtime_path.exists():
+            return False, f"找不到运行时配置: {runtime_path}"
+
+        script_path = find_global_script()
+        script_text = script_path.read_text(encoding='utf-8') if script_path else ""
+        new_rules = extract_script_rules(script_text)
+        generated = new_rules is not None
+        new_rules = new_rules or []
+
+        check_cancelled(cancel_token)
+        emit_event(on_event, EVENT_LOG, f"正在通过控制器 {controller.base_url} 热重载配置...")
+        base_rules = load_base_rules(config_dir, runtime_path)
+        if base_rules is None:
+            base_rules = list(old_rules)
+            save_base_rules(config_dir, runtime_path, base_rules)
+        payload = replace_config_rules(runtime_path.read_text(encoding='utf-8'), new_rules, base_rules)
+        controller.reload_config(payload)
+
+        # 确认新规则已在内核中生效
+        if not rules_active(controller.get_rules(), new_rules):
+            return False, "热重载后内核中的规则与脚本不一致"
+
+        message = f"已热重载配置，{len(new_rules)} 条规则已生效"
+        if not generated:
+            message += "；当前脚本不是由本工具生成，脚本中的其他修改需重启Clash Verge后生效"
+        emit_event(on_event, EVENT_CONFIG_RELOADED, message, rules=len(new_rules))
+        return True, message
+
+    except OperationCancelled:
+        raise
+    except ControllerError as e:
+        return False, f"热重载失败: {e}"
+    except Exception as e:
+        return False, f"热重载时出错: {e}"
+
+def run_with_hot_reload(change, hot_reload=False, on_event=None, cancel_token=None):
+    """执行修改脚本的操作，成功且启用热重载时让规则立即生效
+
+    修改前读取当前脚本的规则，供hot_reload_script()移除旧规则。热重载失败时
+    通过EVENT_LOG报告原因，修改本身仍视为成功。
+
+    参数:
+        change: 无参数的可调用对象，返回(成功状态, 信息消息)
+        hot_reload: 是否在修改成功后热重载
+        on_event: 可选的进度事件回调
+        cancel_token: 可选的CancelToken
+
+    返回:
+        (成功状态, 信息消息, 是否已热重载)
+    """
+    old_rules = read_current_script_rules() if hot_reload else None
+    success, message = change()
+    reloaded = False
+    if success and hot_reload:
+        reloaded, reload_message = hot_reload_script(old_rules, on_event=on_event, cancel_token=cancel_token)
+        if not reloaded:
+            emit_event(on_event, EVENT_LOG, reload_message)
+    return success, message, reloaded
@@ -6,10 +6,126 @@ Clash Verge核心模块 - 提供所有通用功能
 """
 
 import os
+import json
+import difflib
+import hashlib
 import platform
 import shutil
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
+
+# 进度事件类型
+EVENT_LOG = "log"
+EVENT_MIRROR_STARTED = "mirror_started"
+EVENT_MIRROR_FAILED = "mirror_failed"
+EVENT_BYTES_RECEIVED = "bytes_received"
+EVENT_DOMAINS_PARSED = "domains_parsed"
+EVENT_BACKUP_WRITTEN = "backup_written"
+EVENT_SCRIPT_WRITTEN = "script_written"
+EVENT_CONFIG_RELOADED = "config_reloaded"
+EVENT_PHASE_STARTED = "phase_started"
+EVENT_PHASE_FINISHED = "phase_finished"
+
+class ProgressEvent:
+    """进度事件，由核心函数通过on_event回调发出
+
+    属性:
+        kind: 事件类型（EVENT_*常量之一）
+        message: 可直接显示给用户的文本
+        data: 事件附带的结构化数据
+    """
+    def __init__(self, kind, message="", **data):
+        self.kind = kind
+        self.message = message
+        self.data = data
+
+    def __repr__(self):
+        return f"ProgressEvent({self.kind!r}, {self.message!r}, {self.data!r})"
+
+def emit_event(on_event, kind, message="", **data):
+    """向订阅者发送进度事件，on_event为None时忽略"""
+    if on_event is None:
+        return
+    on_event(ProgressEvent(kind, message, **data))
+
+@contextmanager
+def event_phase(on_event, phase):
+    """标记一个处理阶段，开始和结束时发送事件，结束事件带有耗时（秒）"""
+    emit_event(on_event, EVENT_PHASE_STARTED, phase=phase)
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        emit_event(on_event, EVENT_PHASE_FINISHED, phase=phase, duration=time.monotonic() - started)
+
+def print_event(event):
+    """命令行订阅者：将带有文本的事件打印到标准输出"""
+    if event.message:
+        print(event.message)
+
+class OperationCancelled(Exception):
+    """操作已被用户取消"""
+    pass
+
+class CancelToken:
+    """取消令牌，由调用方持有，网络和文件操作在关键点检查
+
+    cancel()可以从任意线程调用。通过register()注册的回调会在取消时立即执行，
+    用于关闭正在阻塞读取的网络连接等。
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """请求取消，并执行已注册的回调"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks)
+            self._callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def register(self, callback):
+        """注册取消回调，返回用于注销的函数；若已取消则立即执行回调"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                def unregister():
+                    with self._lock:
+                        if callback in self._callbacks:
+                            self._callbacks.remove(callback)
+                return unregister
+        callback()
+        return lambda: None
+
+    def check(self):
+        """如果已取消则抛出OperationCancelled"""
+        if self._event.is_set():
+            raise OperationCancelled("操作已取消")
+
+    def wait(self, timeout):
+        """等待最多timeout秒，返回是否已取消"""
+        return self._event.wait(timeout)
+
+def check_cancelled(cancel_token):
+    """检查可选的取消令牌，cancel_token为None时忽略"""
+    if cancel_token is not None:
+        cancel_token.check()
 
 def get_clash_verge_directory():
     """获取Clash Verge配置文件目录"""
@@ -53,17 +169,212 @@ def find_global_script():
     
     return script_files[0]
 
-def backup_file(file_path):
-    """备份文件，返回备份后的文件路径或None（如果失败）"""
+# 备份存储方式：完整副本，或相对上一个备份的行级差异
+BACKUP_MODE_FULL = "full"
+BACKUP_MODE_DELTA = "delta"
+
+# 默认保存完整副本，设置环境变量 DISADOBER_BACKUP_MODE=delta 启用差异备份
+DEFAULT_BACKUP_MODE = os.environ.get("DISADOBER_BACKUP_MODE", BACKUP_MODE_FULL)
+if DEFAULT_BACKUP_MODE not in (BACKUP_MODE_FULL, BACKUP_MODE_DELTA):
+    DEFAULT_BACKUP_MODE = BACKUP_MODE_FULL
+
+# 差异备份链的最大长度，达到后写入完整副本（关键帧），限制还原时需要应用的差异数量
+BACKUP_CHAIN_LIMIT = 16
+
+# 差异备份文件的首行标记
+DELTA_MAGIC = "// disadober-backup-delta\n"
+
+# 修改脚本时持有的建议锁文件，以及等待锁的最长时间（秒）
+SCRIPT_LOCK_NAME = "disadober.lock"
+SCRIPT_LOCK_TIMEOUT = 30
+
+# 替换脚本时保留的上一版本（硬链接）后缀，以及记录最近一次替换的日志
+SCRIPT_PREVIOUS_SUFFIX = ".prev"
+SCRIPT_JOURNAL_NAME = "disadober-journal.json"
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+def read_text_exact(path):
+    """按UTF-8读取文本，保留原始换行符"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return f.read()
+
+def is_delta_backup(backup_path):
+    """判断备份文件是否为差异备份"""
+    with open(backup_path, 'rb') as f:
+        return f.read(len(DELTA_MAGIC.encode('utf-8'))) == DELTA_MAGIC.encode('utf-8')
+
+def load_delta(backup_path):
+    """读取差异备份的内容，返回字典{base, base_sha256, depth, sha256, ops}"""
+    text = read_text_exact(backup_path)
+    return json.loads(text[len(DELTA_MAGIC):])
+
+def compute_line_delta(old_text, new_text):
+    """计算行级差异，操作为["c", 起始行, 结束行]（复制旧内容）或["i", [行, ...]]（插入新行）"""
+    old_lines = old_text.splitlines(keepends=True)
+    new_lines = new_text.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["c", i1, i2])
+        elif j2 > j1:
+            ops.append(["i", new_lines[j1:j2]])
+    return ops
+
+def apply_line_delta(base_text, ops):
+    """把行级差异应用到基准内容上"""
+    base_lines = base_text.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if op[0] == "c":
+            parts.extend(base_lines[op[1]:op[2]])
+        else:
+            parts.extend(op[1])
+    return "".join(parts)
+
+def content_sha256(content):
+    """计算文本内容的SHA-256"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def read_backup(backup_path):
+    """读取备份的完整内容，差异备份会沿备份链重建
+    
+    每个差异记录了基准备份内容的哈希，基准被删除后同名文件被其他内容
+    替换时会被发现，而不是在错误的基准上应用差异。
+    """
+    if not isinstance(backup_path, Path):
+        backup_path = Path(backup_path)
+    
+    # 沿备份链找到最近的关键帧
+    chain = []
+    current = backup_path
+    while is_delta_backup(current):
+        delta = load_delta(current)
+        chain.append(delta)
+        if len(chain) > BACKUP_CHAIN_LIMIT:
+            raise ValueError(f"备份链过长: {backup_path.name}")
+        current = backup_path.parent / delta["base"]
+        if not current.exists():
+            raise FileNotFoundError(f"备份链不完整，缺少: {delta['base']}")
+    
+    # 从关键帧开始依次应用差异
+    content = read_text_exact(current)
+    for delta in reversed(chain):
+        if content_sha256(content) != delta["base_sha256"]:
+            raise ValueError(f"基准备份已被替换: {delta['base']}")
+        content = apply_line_delta(content, delta["ops"])
+        if content_sha256(content) != delta["sha256"]:
+            raise ValueError(f"备份内容校验失败: {backup_path.name}")
+    return content
+
+def describe_backup(backup_path):
+    """检查备份能否还原，返回{base: 基准备份文件名（完整副本为None）, restorable, error}
+    
+    差异备份依赖备份链上的所有备份，其中任何一个被删除或替换后都无法还原。
+    """
+    base = None
+    try:
+        if is_delta_backup(backup_path):
+            base = load_delta(backup_path)["base"]
+        read_backup(backup_path)
+        return {"base": base, "restorable": True, "error": None}
+    except (ValueError, OSError, KeyError) as e:
+        return {"base": base, "restorable": False, "error": str(e)}
+
+def format_backup_status(status):
+    """把describe_backup()的结果格式化为列表中显示的文字"""
+    if not status["restorable"]:
+        return f"不可还原: {status['error']}"
+    if status["base"] is not None:
+        return f"差异，基于 {status['base']}"
+    return "完整副本"
+
+def backup_chain_depth(backup_path):
+    """返回备份在链中的深度，关键帧为0"""
+    if not is_delta_backup(backup_path):
+        return 0
+    return load_delta(backup_path)["depth"]
+
+def find_latest_backup(file_path):
+    """查找文件最近的一个备份，没有时返回None"""
+    backups = sorted(file_path.parent.glob(f"{file_path.stem}.bak.*"),
+                     key=lambda p: p.name.split(".bak.")[-1])
+    return backups[-1] if backups else None
+
+def referenced_backup_names(file_path):
+    """返回文件的差异备份作为基准引用的备份文件名（包括已被删除的）"""
+    names = set()
+    for backup in file_path.parent.glob(f"{file_path.stem}.bak.*"):
+        try:
+            if is_delta_backup(backup):
+                names.add(load_delta(backup)["base"])
+        except (ValueError, OSError, KeyError):
+            continue
+    return names
+
+def unique_backup_path(file_path):
+    """生成不与已有备份重名的备份路径，同一秒内多次备份时顺延时间戳
+    
+    被差异备份引用为基准的文件名即使已被删除也不会重新使用。
+    """
+    now = datetime.now()
+    referenced = referenced_backup_names(file_path)
+    while True:
+        backup_path = file_path.with_suffix(f".bak.{now.strftime('%Y%m%d%H%M%S')}")
+        if not backup_path.exists() and backup_path.name not in referenced:
+            return backup_path
+        now += timedelta(seconds=1)
+
+def backup_file(file_path, on_event=None, mode=None):
+    """备份文件，返回备份后的文件路径或None（如果失败）
+    
+    差异模式下，备份保存为相对上一个备份的行级差异；没有上一个备份、
+    备份链达到BACKUP_CHAIN_LIMIT、上一个备份无法还原或内容无法按文本处理时
+    保存完整副本。默认模式由DEFAULT_BACKUP_MODE决定。
+    """
     if not isinstance(file_path, Path):
         file_path = Path(file_path)
         
     if not file_path.exists():
         return None
     
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    backup_path = file_path.with_suffix(f".bak.{timestamp}")
-    shutil.copy2(str(file_path), str(backup_path))
+    if mode is None:
+        mode = DEFAULT_BACKUP_MODE
+    
+    backup_path = unique_backup_path(file_path)
+    delta = None
+    if mode == BACKUP_MODE_DELTA:
+        previous = find_latest_backup(file_path)
+        try:
+            if previous is not None and backup_chain_depth(previous) + 1 < BACKUP_CHAIN_LIMIT:
+                content = read_text_exact(file_path)
+                base_content = read_backup(previous)
+                delta = {
+                    "base": previous.name,
+                    "base_sha256": content_sha256(base_content),
+                    "depth": backup_chain_depth(previous) + 1,
+                    "sha256": content_sha256(content),
+                    "ops": compute_line_delta(base_content, content),
+                }
+        except (ValueError, OSError, KeyError):
+            # 内容不是UTF-8文本或上一个备份已损坏时，退回完整副本
+            delta = None
+    
+    if delta is None:
+        shutil.copy2(str(file_path), str(backup_path))
+    else:
+        with open(backup_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(DELTA_MAGIC)
+            json.dump(delta, f, ensure_ascii=False, separators=(",", ":"))
+    
+    emit_event(on_event, EVENT_BACKUP_WRITTEN, f"已备份文件: {backup_path.name}",
+               path=backup_path, source=file_path, delta=delta is not None,
+               size=backup_path.stat().st_size)
     return backup_path
 
 def find_backup_files():
@@ -99,12 +410,207 @@ def get_original_name(backup_name):
     # 移除 .bak.时间戳 后缀
     return backup_name.split(".bak.")[0]
 
-def restore_backup(backup_path, auto_backup=True):
+class ScriptLockTimeout(Exception):
+    """等待修改锁超时，其他进程正在修改脚本"""
+    pass
+
+def lock_file(fd):
+    """对文件描述符加非阻塞的排他锁，已被占用时抛出OSError"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+def unlock_file(fd):
+    """释放lock_file()加的锁"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def script_lock(directory=None, timeout=SCRIPT_LOCK_TIMEOUT, cancel_token=None):
+    """持有profiles目录的建议锁，图形界面、命令行和本地服务对脚本的修改互斥
+    
+    锁属于打开的文件描述符，同一进程的不同线程之间同样互斥。
+    """
+    if directory is None:
+        directory = get_profiles_directory()
+    fd = os.open(str(Path(directory) / SCRIPT_LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                lock_file(fd)
+                break
+            except OSError:
+                check_cancelled(cancel_token)
+                if time.monotonic() >= deadline:
+                    raise ScriptLockTimeout("其他程序正在修改脚本，请稍后重试")
+                time.sleep(0.1)
+        try:
+            yield
+        finally:
+            unlock_file(fd)
+    finally:
+        os.close(fd)
+
+def fsync_directory(directory):
+    """把目录项的修改（重命名）写入磁盘，Windows上不支持时忽略"""
+    if os.name == "nt":
+        return
+    fd = os.open(str(directory), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def link_or_copy(source, destination):
+    """原子地让destination拥有source当前的内容：优先硬链接（常数时间），不支持时复制"""
+    tmp_path = destination.with_name(f".{destination.name}.{os.getpid()}.tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    try:
+        os.link(str(source), str(tmp_path))
+    except OSError:
+        shutil.copy2(str(source), str(tmp_path))
+    os.replace(str(tmp_path), str(destination))
+
+def get_previous_path(file_path):
+    """返回文件上一版本的保存路径"""
+    return file_path.with_name(file_path.name + SCRIPT_PREVIOUS_SUFFIX)
+
+def load_journal(directory):
+    """读取最近一次替换的日志，不存在或损坏时返回None"""
+    try:
+        with open(Path(directory) / SCRIPT_JOURNAL_NAME, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_journal(file_path, previous_path):
+    """记录替换后的文件身份（inode、大小、修改时间）和上一版本的位置"""
+    stat = file_path.stat()
+    journal = {
+        "target": file_path.name,
+        "previous": previous_path.name if previous_path is not None else None,
+        "inode": stat.st_ino,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "time": time.time(),
+    }
+    fd, tmp_path = tempfile.mkstemp(dir=str(file_path.parent), prefix=".journal-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(journal, f, ensure_ascii=False)
+        os.replace(tmp_path, str(file_path.parent / SCRIPT_JOURNAL_NAME))
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+def journal_matches(journal, file_path):
+    """检查文件在日志记录之后是否未被其他程序修改"""
+    stat = file_path.stat()
+    return (journal.get("inode") == stat.st_ino and journal.get("size") == stat.st_size
+            and journal.get("mtime_ns") == stat.st_mtime_ns)
+
+def replace_script(file_path, content, newline=None):
+    """原子地替换文件内容，替换前的版本保留为上一版本供rollback_script()使用
+    
+    新内容写入同一目录下的临时文件并fsync后，通过os.replace()替换，读取方
+    只会看到完整的旧文件或新文件。上一版本通过硬链接保留，不复制内容。
+    调用方应持有script_lock()。
+    
+    参数:
+        file_path: 目标文件路径
+        content: 文本内容，为bytes时按二进制写入
+        newline: 文本模式下的换行符处理，与open()相同
+        
+    返回:
+        上一版本的路径，文件原本不存在时为None
+    """
+    if not isinstance(file_path, Path):
+        file_path = Path(file_path)
+    
+    fd, tmp_path = tempfile.mkstemp(dir=str(file_path.parent), prefix=f".{file_path.name}.", suffix=".tmp")
+    try:
+        if isinstance(content, bytes):
+            f = os.fdopen(fd, 'wb')
+        else:
+            f = os.fdopen(fd, 'w', encoding='utf-8', newline=newline)
+        with f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        previous_path = None
+        if file_path.exists():
+            shutil.copymode(str(file_path), tmp_path)
+            previous_path = get_previous_path(file_path)
+            link_or_copy(file_path, previous_path)
+        os.replace(tmp_path, str(file_path))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    
+    fsync_directory(file_path.parent)
+    write_journal(file_path, previous_path)
+    return previous_path
+
+def rollback_script(directory=None, on_event=None, cancel_token=None):
+    """通过重命名回滚最近一次替换，耗时与脚本大小无关
+    
+    当前版本与上一版本互换，再次回滚即可恢复。脚本在上次替换后被其他程序
+    修改过时拒绝回滚，避免覆盖这些修改。
+    
+    返回:
+        (成功状态, 信息消息)
+    """
+    try:
+        directory = Path(directory) if directory is not None else get_profiles_directory()
+        
+        with script_lock(directory, cancel_token=cancel_token):
+            journal = load_journal(directory)
+            if not journal or not journal.get("previous"):
+                return False, "没有可回滚的上一版本"
+            target = directory / journal["target"]
+            previous_path = directory / journal["previous"]
+            if not previous_path.exists():
+                return False, f"上一版本不存在: {previous_path.name}"
+            if target.exists() and not journal_matches(journal, target):
+                return False, f"{target.name} 在上次修改后已被其他程序更改，无法安全回滚"
+            
+            check_cancelled(cancel_token)
+            with event_phase(on_event, "write"):
+                # 先把当前版本链接到临时名称，交换后成为新的上一版本
+                swap_path = previous_path.with_name(f".{previous_path.name}.swap")
+                if target.exists():
+                    link_or_copy(target, swap_path)
+                os.replace(str(previous_path), str(target))
+                if swap_path.exists():
+                    os.replace(str(swap_path), str(previous_path))
+                fsync_directory(directory)
+                write_journal(target, previous_path if previous_path.exists() else None)
+        
+        emit_event(on_event, EVENT_SCRIPT_WRITTEN, f"已写入脚本: {target.name}",
+                   path=target, source=previous_path)
+        return True, f"已回滚到上一版本: {target.name}"
+    
+    except OperationCancelled:
+        raise
+    except Exception as e:
+        return False, f"回滚时出错: {e}"
+
+def restore_backup(backup_path, auto_backup=True, on_event=None, cancel_token=None):
     """还原备份文件
     
     参数:
         backup_path: 要还原的备份文件路径
         auto_backup: 是否自动备份当前文件
+        on_event: 可选的进度事件回调，接收ProgressEvent
+        cancel_token: 可选的CancelToken，在写入文件前检查
         
     返回:
         (成功状态, 信息消息)
@@ -120,16 +626,30 @@ def restore_backup(backup_path, auto_backup=True):
         original_name = get_original_name(backup_path.name) + ".js"
         destination = backup_path.parent / original_name
         
-        # 备份当前文件
-        if auto_backup and destination.exists():
-            # 这里不再有变量名冲突，直接调用backup_file函数
-            current_backup = backup_file(destination)
-            if current_backup is None:
-                return False, f"无法备份当前文件: {destination}"
-        
-        # 复制文件
-        shutil.copy2(str(backup_path), str(destination))
+        # 备份当前文件并写入备份内容，持有修改锁避免与其他程序同时修改
+        check_cancelled(cancel_token)
+        with script_lock(backup_path.parent, cancel_token=cancel_token):
+            if auto_backup and destination.exists():
+                with event_phase(on_event, "backup"):
+                    current_backup = backup_file(destination, on_event=on_event)
+                if current_backup is None:
+                    return False, f"无法备份当前文件: {destination}"
+            
+            # 差异备份需要先沿备份链重建
+            with event_phase(on_event, "write"):
+                if is_delta_backup(backup_path):
+                    content = read_backup(backup_path)
+                    check_cancelled(cancel_token)
+                    replace_script(destination, content, newline='')
+                else:
+                    content = backup_path.read_bytes()
+                    check_cancelled(cancel_token)
+                    replace_script(destination, content)
+        emit_event(on_event, EVENT_SCRIPT_WRITTEN, f"已写入脚本: {destination.name}",
+                   path=destination, source=backup_path)
         return True, f"已成功还原文件: {original_name}"
     
+    except OperationCancelled:
+        raise
     except Exception as e:
         return False, f"还原备份时出错: {e}" 
\ No newline at end of file
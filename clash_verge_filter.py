@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Clash Verge域名过滤模块 - 按厂商规则从hosts内容中筛选需要屏蔽的域名
+"""
+
+import re
+import json
+
+# 默认厂商规则，每个厂商可以包含substrings、suffixes和regexes三类规则
+DEFAULT_VENDOR_RULES = {
+    "adobe": {
+        "substrings": ["adobe"],
+    },
+}
+
+# 规则文件中允许的规则类型
+RULE_KINDS = ("substrings", "suffixes", "regexes")
+
+# hosts文件中需要识别的行前缀
+HOSTS_PREFIX = "127.0.0.1 "
+
+def build_vendor_patterns(vendor_rules):
+    """把单个厂商的规则转换为正则表达式片段列表"""
+    patterns = []
+    for substring in vendor_rules.get("substrings", []):
+        patterns.append(re.escape(substring))
+    for suffix in vendor_rules.get("suffixes", []):
+        patterns.append(r"(?:^|\.)" + re.escape(suffix.lstrip(".")) + "$")
+    for regex in vendor_rules.get("regexes", []):
+        patterns.append(f"(?:{regex})")
+    return patterns
+
+def load_vendor_rules(path):
+    """从JSON文件加载厂商规则，格式与DEFAULT_VENDOR_RULES相同
+
+    规则文件中的Adobe规则与默认的Adobe规则合并，文件中没有adobe时也会加入，
+    因此Adobe域名始终会被提取。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        rules = json.load(f)
+
+    if not isinstance(rules, dict):
+        raise ValueError("规则文件必须是以厂商名为键的JSON对象")
+    for vendor, vendor_rules in rules.items():
+        if not isinstance(vendor_rules, dict):
+            raise ValueError(f"厂商 {vendor} 的规则必须是JSON对象")
+        for kind, values in vendor_rules.items():
+            if kind not in RULE_KINDS:
+                raise ValueError(f"厂商 {vendor} 包含未知的规则类型: {kind}")
+            if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+                raise ValueError(f"厂商 {vendor} 的 {kind} 必须是字符串列表")
+
+    adobe_rules = {kind: list(values) for kind, values in DEFAULT_VENDOR_RULES["adobe"].items()}
+    for kind, values in rules.get("adobe", {}).items():
+        adobe_rules.setdefault(kind, [])
+        adobe_rules[kind].extend(value for value in values if value not in adobe_rules[kind])
+    merged = {"adobe": adobe_rules}
+    merged.update((vendor, vendor_rules) for vendor, vendor_rules in rules.items() if vendor != "adobe")
+    return merged
+
+class DomainFilter:
+    """多厂商域名过滤器
+
+    所有厂商的规则被编译为一个组合正则，每个厂商对应一个命名分组，
+    每个域名只需匹配一次即可确定所属厂商，增加厂商不会成倍增加解析开销。
+    同一域名匹配多个厂商时，归属于匹配位置最靠前的厂商，位置相同时按规则顺序。
+    """
+    def __init__(self, rules=None):
+        if rules is None:
+            rules = DEFAULT_VENDOR_RULES
+        self.vendors = list(rules)
+        self._groups = {}
+
+        alternatives = []
+        for index, vendor in enumerate(self.vendors):
+            patterns = build_vendor_patterns(rules[vendor])
+            if not patterns:
+                continue
+            group = f"_vendor_{index}"
+            self._groups[group] = vendor
+            alternatives.append(f"(?P<{group}>{'|'.join(patterns)})")
+
+        if alternatives:
+            self.pattern = re.compile("|".join(alternatives), re.IGNORECASE)
+        else:
+            self.pattern = None
+
+    def match(self, domain):
+        """返回域名所属的厂商，不匹配任何厂商时返回None"""
+        if self.pattern is None:
+            return None
+        m = self.pattern.search(domain)
+        if m is None:
+            return None
+        for group, vendor in self._groups.items():
+            if m.group(group) is not None:
+                return vendor
+        return None
+
+    def extract(self, content):
+        """从hosts内容中提取各厂商的域名
+
+        返回:
+            {厂商: [域名, ...]}，只包含至少有一个域名的厂商，域名去重并保持出现顺序
+        """
+        result = {}
+        seen = set()
+        for line in content.splitlines():
+            line = line.strip()
+            if not line.startswith(HOSTS_PREFIX):
+                continue
+            domain = line.split(" ")[1]
+            if domain in seen:
+                continue
+            vendor = self.match(domain)
+            if vendor is not None:
+                seen.add(domain)
+                result.setdefault(vendor, []).append(domain)
+        return result
+
+# 默认过滤器，只包含Adobe规则
+DEFAULT_FILTER = DomainFilter()
@@ -13,11 +13,40 @@ from clash_verge_core import (
     get_profiles_directory,
     find_backup_files,
     extract_backup_time,
+    describe_backup,
+    format_backup_status,
     get_original_name,
-    restore_backup
+    restore_backup,
+    rollback_script,
+    print_event
 )
 
-def interactive_restore():
+# 导入热重载模块
+from clash_verge_controller import run_with_hot_reload
+
+# 导入本地服务模块
+from clash_verge_service import (
+    service_available,
+    call_service
+)
+
+# 导入运行指标模块
+from clash_verge_metrics import (
+    record_run,
+    parse_metrics_dir
+)
+
+def report_restore_result(success, message, reloaded=False):
+    """打印还原结果，未热重载时提示重启"""
+    if not success:
+        print(f"还原失败: {message}")
+        return
+    
+    print(f"{message}")
+    if not reloaded:
+        print("请重启Clash Verge以应用更改")
+
+def interactive_restore(hot_reload=False):
     """交互式还原备份"""
     print("Clash Verge备份还原工具")
     print("-" * 50)
@@ -30,7 +59,8 @@ def interactive_restore():
     print("找到以下备份文件:")
     for i, file_path in enumerate(backups, 1):
         time_str = extract_backup_time(file_path)
-        print(f"{i}. {file_path.name} (备份于 {time_str})")
+        status = format_backup_status(describe_backup(file_path))
+        print(f"{i}. {file_path.name} (备份于 {time_str}，{status})")
     
     choice = input("请选择要还原的备份文件 (输入编号，或输入q取消): ")
     if choice.lower() == 'q':
@@ -52,21 +82,18 @@ def interactive_restore():
             return
             
         # 还原备份
-        success, message = restore_backup(backup_file)
-        if success:
-            print(f"{message}")
-            print("请重启Clash Verge以应用更改")
-        else:
-            print(f"还原失败: {message}")
+        report_restore_result(*run_with_hot_reload(lambda: restore_backup(backup_file, on_event=print_event),
+                                                   hot_reload, on_event=print_event))
     
     except Exception as e:
         print(f"发生错误: {e}")
 
-def restore_backup_by_index(idx):
+def restore_backup_by_index(idx, on_event=None):
     """通过索引还原备份
     
     参数:
         idx: 备份文件的索引（从1开始）
+        on_event: 可选的进度事件回调
         
     返回:
         (成功状态, 信息消息)
@@ -80,16 +107,17 @@ def restore_backup_by_index(idx):
             return False, "无效的备份索引"
         
         backup_file = backups[idx - 1]
-        return restore_backup(backup_file)
+        return restore_backup(backup_file, on_event=on_event)
         
     except Exception as e:
         return False, f"还原备份时出错: {e}"
 
-def restore_backup_by_name(backup_name):
+def restore_backup_by_name(backup_name, on_event=None):
     """通过文件名还原备份
     
     参数:
         backup_name: 备份文件名
+        on_event: 可选的进度事件回调
         
     返回:
         (成功状态, 信息消息)
@@ -101,7 +129,7 @@ def restore_backup_by_name(backup_name):
         if not backup_file.exists():
             return False, f"备份文件不存在: {backup_name}"
         
-        return restore_backup(backup_file)
+        return restore_backup(backup_file, on_event=on_event)
         
     except Exception as e:
         return False, f"还原备份时出错: {e}"
@@ -111,30 +139,59 @@ def main():
     try:
         import sys
         
-        # 如果提供了备份索引，直接还原
-        if len(sys.argv) > 1:
-            try:
-                idx = int(sys.argv[1])
-                success, message = restore_backup_by_index(idx)
-                if success:
-                    print(f"{message}")
-                    print("请重启Clash Verge以应用更改")
-                else:
-                    print(f"还原失败: {message}")
+        # --reload 表示还原后通过控制器热重载；--metrics-dir=目录 写入Prometheus指标；
+        # --rollback 回滚最近一次修改
+        hot_reload = "--reload" in sys.argv[1:]
+        metrics_dir = parse_metrics_dir(sys.argv[1:])
+        args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+        
+        # --rollback 通过重命名撤销最近一次修改，不需要重建备份
+        if "--rollback" in sys.argv[1:]:
+            if service_available():
+                result = record_run("rollback",
+                                    lambda on_event: call_service("rollback", {"hot_reload": hot_reload},
+                                                                  on_event=on_event),
+                                    metrics_dir, on_event=print_event)
+                report_restore_result(result["success"], result["message"], result["reloaded"])
                 return
+            
+            result = record_run("rollback",
+                                lambda on_event: run_with_hot_reload(lambda: rollback_script(on_event=on_event),
+                                                                     hot_reload, on_event=on_event),
+                                metrics_dir, on_event=print_event)
+            report_restore_result(*result)
+            return
+        
+        # 本地服务正在运行时，由服务执行非交互的还原
+        if args and service_available():
+            params = {"hot_reload": hot_reload}
+            try:
+                params["index"] = int(args[0])
             except ValueError:
-                # 如果不是数字，当作文件名处理
-                backup_name = sys.argv[1]
-                success, message = restore_backup_by_name(backup_name)
-                if success:
-                    print(f"{message}")
-                    print("请重启Clash Verge以应用更改")
-                else:
-                    print(f"还原失败: {message}")
-                return
+                params["name"] = args[0]
+            result = record_run("restore", lambda on_event: call_service("restore", params, on_event=on_event),
+                                metrics_dir, on_event=print_event)
+            report_restore_result(result["success"], result["message"], result["reloaded"])
+            return
+        
+        # 如果提供了备份索引，直接还原
+        if args:
+            def restore(on_event):
+                try:
+                    idx = int(args[0])
+                except ValueError:
+                    # 如果不是数字，当作文件名处理
+                    return restore_backup_by_name(args[0], on_event=on_event)
+                return restore_backup_by_index(idx, on_event=on_event)
+            
+            def run(on_event):
+                return run_with_hot_reload(lambda: restore(on_event), hot_reload, on_event=on_event)
+            
+            report_restore_result(*record_run("restore", run, metrics_dir, on_event=print_event))
+            return
         
         # 交互式还原
-        interactive_restore()
+        interactive_restore(hot_reload)
         
     except Exception as e:
         print(f"发生错误: {e}")
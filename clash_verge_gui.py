@@ -6,10 +6,13 @@ Clash Verge GUI工具 - 提供图形化界面
 """
 
 import os
-import sys
+import queue
 import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext, simpledialog
+from tkinter import ttk, messagebox, scrolledtext, simpledialog, filedialog
 from pathlib import Path
 from datetime import datetime
 
@@ -18,7 +21,12 @@ from clash_verge_core import (
     find_backup_files, 
     extract_backup_time, 
     get_original_name,
-    restore_backup
+    restore_backup,
+    describe_backup,
+    format_backup_status,
+    CancelToken,
+    OperationCancelled,
+    EVENT_BYTES_RECEIVED
 )
 
 # 导入Adobe屏蔽模块
@@ -29,6 +37,14 @@ from clash_verge_adobe_block import (
     BUILTIN_ADOBE_DOMAINS
 )
 
+# 导入本地屏蔽列表模块
+from clash_verge_import import import_local_block_lists
+
+# 导入热重载模块
+from clash_verge_controller import (
+    run_with_hot_reload
+)
+
 # 设置GUI样式
 ttk_style = None
 try:
@@ -38,23 +54,100 @@ try:
 except ImportError:
     has_sv_ttk = False
 
-class RedirectText:
-    """重定向文本到Tkinter文本控件"""
-    def __init__(self, text_widget):
+class EventLog:
+    """将核心模块的进度事件转发到Tkinter文本控件
+
+    事件可能来自任意工作线程，所有控件操作都通过应用的UI队列在主线程执行。
+    """
+    def __init__(self, app, text_widget):
+        self.app = app
         self.text_widget = text_widget
-        self.buffer = ""
 
-    def write(self, string):
-        self.buffer += string
-        if self.text_widget:
-            self.text_widget.configure(state="normal")
-            self.text_widget.insert(tk.END, string)
-            self.text_widget.see(tk.END)
-            self.text_widget.configure(state="disabled")
-            self.text_widget.update()
+    def __call__(self, event):
+        if event.kind == EVENT_BYTES_RECEIVED:
+            self.app.call_in_main(self.app.show_download_progress, event)
+        elif event.message:
+            self.write(event.message)
+
+    def write(self, message):
+        self.app.call_in_main(self.app.append_log, self.text_widget, message)
+
+class Job:
+    """后台任务，持有自己的取消令牌"""
+    def __init__(self, name, func, group=None, on_done=None):
+        self.name = name
+        self.func = func
+        self.group = group
+        self.on_done = on_done
+        self.token = CancelToken()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+
+    def cancel(self):
+        """请求取消任务，正在进行的下载会被立即中断"""
+        self.token.cancel()
+
+class JobScheduler:
+    """有界线程池任务调度器
+
+    同一分组（group）的任务按提交顺序串行执行，例如所有写入全局脚本的任务；
+    不同分组或未分组的任务在线程池中并行执行。任务完成回调通过dispatch在主线程执行。
+    """
+    def __init__(self, dispatch, max_workers=2):
+        self.dispatch = dispatch
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="clash-verge-job")
+        self._lock = threading.Lock()
+        self._busy_groups = set()
+        self._pending = {}
+        self._jobs = set()
+
+    def submit(self, name, func, group=None, on_done=None):
+        """提交任务，func接收CancelToken参数，返回Job"""
+        job = Job(name, func, group, on_done)
+        with self._lock:
+            self._jobs.add(job)
+            if group is not None:
+                if group in self._busy_groups:
+                    self._pending.setdefault(group, deque()).append(job)
+                    return job
+                self._busy_groups.add(group)
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        try:
+            job.token.check()
+            job.result = job.func(job.token)
+        except OperationCancelled:
+            job.cancelled = True
+        except Exception as e:
+            job.error = e
+        finally:
+            next_job = None
+            with self._lock:
+                self._jobs.discard(job)
+                pending = self._pending.get(job.group)
+                if pending:
+                    next_job = pending.popleft()
+                else:
+                    self._busy_groups.discard(job.group)
+            if next_job is not None:
+                self._executor.submit(self._run, next_job)
+            if job.on_done is not None:
+                self.dispatch(job.on_done, job)
+
+    def cancel_all(self):
+        """取消所有未完成的任务"""
+        with self._lock:
+            jobs = list(self._jobs)
+        for job in jobs:
+            job.cancel()
 
-    def flush(self):
-        pass
+    def shutdown(self):
+        """取消所有任务并关闭线程池"""
+        self.cancel_all()
+        self._executor.shutdown(wait=False)
 
 class ManualDomainsDialog:
     """手动输入域名对话框"""
@@ -112,8 +205,21 @@ class ClashVergeApp:
         except:
             pass
         
-        # 创建输出重定向
-        self.text_redirect = RedirectText(None)
+        # 工作线程提交到主线程执行的UI操作
+        self.ui_queue = queue.Queue()
+        self.root.after(50, self.process_ui_queue)
+        
+        # 后台任务调度器
+        self.jobs = JobScheduler(self.call_in_main)
+        self.apply_job = None
+        self.restore_job = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # 修改脚本后是否通过控制器热重载，两个选项卡共用
+        self.hot_reload_var = tk.BooleanVar(value=False)
+        
+        # 应用规则前是否剔除多次确认无法解析的域名
+        self.prune_var = tk.BooleanVar(value=False)
         
         # 创建状态栏
         self.status_var = tk.StringVar()
@@ -144,7 +250,14 @@ class ClashVergeApp:
         btn_frame = ttk.Frame(frame)
         btn_frame.pack(fill=tk.X, pady=(0, 10))
         
-        ttk.Button(btn_frame, text="应用Adobe屏蔽规则", command=self.apply_adobe_block).pack(side=tk.LEFT, padx=5)
+        self.apply_button = ttk.Button(btn_frame, text="应用Adobe屏蔽规则", command=self.apply_adobe_block)
+        self.apply_button.pack(side=tk.LEFT, padx=5)
+        self.import_button = ttk.Button(btn_frame, text="从本地文件导入", command=self.import_local_files)
+        self.import_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_apply_button = ttk.Button(btn_frame, text="取消", state="disabled", command=self.cancel_apply)
+        self.cancel_apply_button.pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(btn_frame, text="热重载（无需重启）", variable=self.hot_reload_var).pack(side=tk.RIGHT, padx=5)
+        ttk.Checkbutton(btn_frame, text="剔除失效域名", variable=self.prune_var).pack(side=tk.RIGHT, padx=5)
         
         # 创建输出区域
         output_frame = ttk.LabelFrame(frame, text="输出日志")
@@ -153,8 +266,7 @@ class ClashVergeApp:
         self.adobe_text = scrolledtext.ScrolledText(output_frame, state="disabled")
         self.adobe_text.pack(fill=tk.BOTH, expand=True)
         
-        # 更新输出重定向
-        self.text_redirect.text_widget = self.adobe_text
+        self.adobe_log = EventLog(self, self.adobe_text)
     
     def init_restore_tab(self):
         """初始化还原备份选项卡"""
@@ -166,7 +278,7 @@ class ClashVergeApp:
         list_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
         
         # 创建Treeview显示备份列表
-        columns = ("文件名", "备份时间", "文件大小", "修改时间")
+        columns = ("文件名", "备份时间", "文件大小", "修改时间", "状态")
         self.backup_tree = ttk.Treeview(list_frame, columns=columns, show="headings")
         
         # 设置列
@@ -177,6 +289,7 @@ class ClashVergeApp:
         self.backup_tree.column("备份时间", width=150)
         self.backup_tree.column("文件大小", width=100)
         self.backup_tree.column("修改时间", width=150)
+        self.backup_tree.column("状态", width=250)
         
         # 添加滚动条
         scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.backup_tree.yview)
@@ -190,7 +303,11 @@ class ClashVergeApp:
         btn_frame.pack(fill=tk.X, pady=(0, 10))
         
         ttk.Button(btn_frame, text="刷新列表", command=self.refresh_backup_list).pack(side=tk.LEFT, padx=5)
-        ttk.Button(btn_frame, text="还原选中备份", command=self.restore_backup).pack(side=tk.LEFT, padx=5)
+        self.restore_button = ttk.Button(btn_frame, text="还原选中备份", command=self.restore_backup)
+        self.restore_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_restore_button = ttk.Button(btn_frame, text="取消", state="disabled", command=self.cancel_restore)
+        self.cancel_restore_button.pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(btn_frame, text="热重载（无需重启）", variable=self.hot_reload_var).pack(side=tk.RIGHT, padx=5)
         
         # 创建输出区域
         output_frame = ttk.LabelFrame(frame, text="输出日志")
@@ -198,136 +315,260 @@ class ClashVergeApp:
         
         self.restore_text = scrolledtext.ScrolledText(output_frame, state="disabled")
         self.restore_text.pack(fill=tk.BOTH, expand=True)
+        self.restore_log = EventLog(self, self.restore_text)
         
         # 初始加载备份列表
         self.refresh_backup_list()
     
+    def call_in_main(self, func, *args):
+        """在主线程中执行func，可从任意线程调用"""
+        self.ui_queue.put((func, args))
+    
+    def process_ui_queue(self):
+        """执行工作线程提交的UI操作"""
+        # 先安排下一次轮询，模态对话框的嵌套事件循环中也能继续处理队列
+        self.root.after(50, self.process_ui_queue)
+        while True:
+            try:
+                func, args = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            func(*args)
+    
+    def ask_in_main(self, cancel_token, func, *args, **kwargs):
+        """从工作线程在主线程中弹出对话框，阻塞等待结果
+        
+        等待期间任务被取消时抛出OperationCancelled。
+        """
+        done = threading.Event()
+        result = {}
+        
+        def run():
+            try:
+                result["value"] = func(*args, **kwargs)
+            except Exception as e:
+                result["error"] = e
+            finally:
+                done.set()
+        
+        self.call_in_main(run)
+        while not done.wait(0.1):
+            cancel_token.check()
+        if "error" in result:
+            raise result["error"]
+        return result["value"]
+    
+    def on_close(self):
+        """关闭窗口时取消所有后台任务"""
+        self.jobs.shutdown()
+        self.root.destroy()
+    
+    def append_log(self, text_widget, message):
+        """向输出日志追加一行"""
+        text_widget.configure(state="normal")
+        text_widget.insert(tk.END, message + "\n")
+        text_widget.see(tk.END)
+        text_widget.configure(state="disabled")
+    
+    def show_download_progress(self, event):
+        """在状态栏显示下载进度"""
+        received = event.data["received"]
+        total = event.data.get("total")
+        if total:
+            self.status_var.set(f"正在下载... {received / 1024:.1f} / {total / 1024:.1f} KB")
+        else:
+            self.status_var.set(f"正在下载... {received / 1024:.1f} KB")
+    
     def show_message(self, title, message):
         """显示消息框"""
         messagebox.showinfo(title, message)
     
     def apply_adobe_block(self):
         """应用Adobe屏蔽规则"""
-        # 禁用按钮
-        for widget in self.tab1.winfo_children():
-            if isinstance(widget, ttk.Frame):
-                for child in widget.winfo_children():
-                    if isinstance(child, ttk.Button):
-                        child.configure(state="disabled")
+        if self.apply_job is not None:
+            return
         
+        self.set_apply_busy(True)
         self.status_var.set("正在应用Adobe屏蔽规则...")
         
-        # 在新线程中运行，避免界面冻结
-        def run_block():
-            try:
-                # 保存原始输出并重定向
-                old_stdout = sys.stdout
-                sys.stdout = self.text_redirect
-                
-                print("正在下载Adobe屏蔽列表...")
+        log = self.adobe_log
+        hot_reload = self.hot_reload_var.get()
+        prune = self.prune_var.get()
+        
+        # 在后台任务中运行，避免界面冻结
+        def run_block(token):
+            log.write("正在下载Adobe屏蔽列表...")
+            
+            # 下载Adobe屏蔽列表
+            domains = download_adobe_block_list(on_event=log, cancel_token=token)
+            if not domains:
+                # 如果内置代理都失败，询问用户
+                log.write("无法通过内置代理下载Adobe屏蔽名单。")
+                if self.ask_in_main(token, messagebox.askyesno, "下载失败",
+                                    "无法通过内置代理下载Adobe屏蔽名单。\n是否输入自定义GitHub代理地址？",
+                                    parent=self.root):
+                    custom_proxy = self.ask_in_main(token, simpledialog.askstring, "输入代理",
+                                                    "请输入GitHub代理地址（例如：https://example.com/）:",
+                                                    parent=self.root)
+                    if custom_proxy:
+                        domains = try_download_with_custom_proxy(custom_proxy, on_event=log, cancel_token=token)
                 
-                # 下载Adobe屏蔽列表
-                domains = download_adobe_block_list()
+                # 如果依然失败，询问用户是否手动输入
                 if not domains:
-                    # 如果内置代理都失败，询问用户
-                    print("无法通过内置代理下载Adobe屏蔽名单。")
-                    if messagebox.askyesno("下载失败", "无法通过内置代理下载Adobe屏蔽名单。\n是否输入自定义GitHub代理地址？"):
-                        custom_proxy = simpledialog.askstring("输入代理", "请输入GitHub代理地址（例如：https://example.com/）:")
-                        if custom_proxy:
-                            print(f"尝试使用自定义代理: {custom_proxy}")
-                            domains = try_download_with_custom_proxy(custom_proxy)
-                    
-                    # 如果依然失败，询问用户是否手动输入
-                    if not domains:
-                        print("无法下载Adobe屏蔽名单。")
-                        if messagebox.askyesno("下载失败", "无法下载Adobe屏蔽名单。\n是否手动输入域名列表？"):
-                            dialog = ManualDomainsDialog(self.root)
-                            domains = dialog.domains
-                            if domains:
-                                print(f"已手动输入 {len(domains)} 个域名")
-                    
-                    # 如果用户没有输入域名，使用内置域名
-                    if not domains:
-                        print("使用内置的Adobe域名列表")
-                        domains = BUILTIN_ADOBE_DOMAINS
-                
-                print(f"成功获取到 {len(domains)} 个Adobe相关域名")
+                    log.write("无法下载Adobe屏蔽名单。")
+                    if self.ask_in_main(token, messagebox.askyesno, "下载失败",
+                                        "无法下载Adobe屏蔽名单。\n是否手动输入域名列表？",
+                                        parent=self.root):
+                        domains = self.ask_in_main(token, lambda: ManualDomainsDialog(self.root).domains)
+                        if domains:
+                            log.write(f"已手动输入 {len(domains)} 个域名")
                 
-                # 应用Adobe屏蔽规则
-                print("正在应用Adobe屏蔽规则...")
-                success, message = modify_clash_verge_script(domains)
-                
-                if success:
-                    print(message)
-                    print("Adobe屏蔽规则已应用。请重启Clash Verge以生效。")
-                    self.show_message("成功", "Adobe屏蔽规则已应用。\n请重启Clash Verge以生效。")
-                    
-                    # 刷新备份列表
-                    self.refresh_backup_list()
-                else:
-                    print(f"错误: {message}")
-                    self.show_message("错误", message)
+                # 如果用户没有输入域名，使用内置域名
+                if not domains:
+                    log.write("使用内置的Adobe域名列表")
+                    domains = BUILTIN_ADOBE_DOMAINS
             
-            except Exception as e:
-                print(f"发生错误: {e}")
-                self.show_message("错误", f"发生错误: {e}")
+            log.write(f"成功获取到 {len(domains)} 个Adobe相关域名")
             
-            finally:
-                # 恢复标准输出
-                sys.stdout = old_stdout
-                
-                # 恢复按钮状态
-                def enable_buttons():
-                    for widget in self.tab1.winfo_children():
-                        if isinstance(widget, ttk.Frame):
-                            for child in widget.winfo_children():
-                                if isinstance(child, ttk.Button):
-                                    child.configure(state="normal")
-                    self.status_var.set("就绪")
-                
-                # 在主线程中恢复按钮状态
-                self.root.after(0, enable_buttons)
+            # 应用Adobe屏蔽规则
+            log.write("正在应用Adobe屏蔽规则...")
+            return run_with_hot_reload(
+                lambda: modify_clash_verge_script(domains, on_event=log, cancel_token=token, prune=prune),
+                hot_reload, on_event=log, cancel_token=token)
         
-        # 启动线程
-        threading.Thread(target=run_block, daemon=True).start()
+        self.apply_job = self.jobs.submit("apply", run_block, group="script", on_done=self.on_apply_done)
     
-    def refresh_backup_list(self):
-        """刷新备份文件列表"""
-        # 清空当前列表
-        for item in self.backup_tree.get_children():
-            self.backup_tree.delete(item)
-        
-        # 获取备份文件
-        backup_files = find_backup_files()
+    def import_local_files(self):
+        """从本地hosts文件导入Adobe域名并应用屏蔽规则"""
+        if self.apply_job is not None:
+            return
         
-        # 如果没有找到备份文件
-        if not backup_files:
-            self.status_var.set("未找到备份文件")
+        paths = filedialog.askopenfilenames(parent=self.root, title="选择hosts或屏蔽列表文件")
+        if not paths:
             return
         
-        # 显示备份文件
-        for backup_file in backup_files:
-            backup_time = extract_backup_time(backup_file)
+        self.set_apply_busy(True)
+        self.status_var.set("正在导入本地文件...")
+        
+        log = self.adobe_log
+        hot_reload = self.hot_reload_var.get()
+        prune = self.prune_var.get()
+        
+        # 在后台任务中扫描文件并应用规则
+        def run_import(token):
+            domains = import_local_block_lists(paths, on_event=log, cancel_token=token)
+            if not domains:
+                return False, "未在所选文件中找到Adobe相关域名", False
             
-            # 获取文件大小
-            file_size = os.path.getsize(backup_file)
-            if file_size < 1024:
-                size_str = f"{file_size} B"
-            elif file_size < 1024 * 1024:
-                size_str = f"{file_size / 1024:.1f} KB"
+            log.write("正在应用Adobe屏蔽规则...")
+            return run_with_hot_reload(
+                lambda: modify_clash_verge_script(domains, on_event=log, cancel_token=token, prune=prune),
+                hot_reload, on_event=log, cancel_token=token)
+        
+        self.apply_job = self.jobs.submit("import", run_import, group="script", on_done=self.on_apply_done)
+    
+    def set_apply_busy(self, busy):
+        """切换Adobe屏蔽选项卡按钮状态"""
+        state = "disabled" if busy else "normal"
+        self.apply_button.configure(state=state)
+        self.import_button.configure(state=state)
+        self.cancel_apply_button.configure(state="normal" if busy else "disabled")
+    
+    def on_apply_done(self, job):
+        """应用或导入任务结束后在主线程中处理结果"""
+        self.apply_job = None
+        self.set_apply_busy(False)
+        self.status_var.set("就绪")
+        
+        log = self.adobe_log
+        if job.cancelled:
+            log.write("已取消应用Adobe屏蔽规则")
+            return
+        if job.error is not None:
+            log.write(f"发生错误: {job.error}")
+            self.show_message("错误", f"发生错误: {job.error}")
+            return
+        
+        success, message, reloaded = job.result
+        if success:
+            log.write(message)
+            if reloaded:
+                log.write("Adobe屏蔽规则已应用并立即生效。")
+                self.show_message("成功", "Adobe屏蔽规则已应用并立即生效。")
             else:
-                size_str = f"{file_size / (1024 * 1024):.1f} MB"
+                log.write("Adobe屏蔽规则已应用。请重启Clash Verge以生效。")
+                self.show_message("成功", "Adobe屏蔽规则已应用。\n请重启Clash Verge以生效。")
             
-            # 获取修改时间
-            mtime = os.path.getmtime(backup_file)
-            mod_time = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M:%S")
+            # 刷新备份列表
+            self.refresh_backup_list()
+        else:
+            log.write(f"错误: {message}")
+            self.show_message("错误", message)
+    
+    def cancel_apply(self):
+        """取消正在进行的应用任务"""
+        if self.apply_job is not None:
+            self.status_var.set("正在取消...")
+            self.apply_job.cancel()
+    
+    def refresh_backup_list(self):
+        """刷新备份文件列表"""
+        # 在后台任务中读取备份文件信息
+        def scan(token):
+            rows = []
+            for backup_file in find_backup_files():
+                token.check()
+                backup_time = extract_backup_time(backup_file)
+                
+                # 获取文件大小
+                file_size = os.path.getsize(backup_file)
+                if file_size < 1024:
+                    size_str = f"{file_size} B"
+                elif file_size < 1024 * 1024:
+                    size_str = f"{file_size / 1024:.1f} KB"
+                else:
+                    size_str = f"{file_size / (1024 * 1024):.1f} MB"
+                
+                # 获取修改时间
+                mtime = os.path.getmtime(backup_file)
+                mod_time = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M:%S")
+                
+                # 差异备份显示所依赖的基准，备份链不完整时标记为不可还原
+                status = format_backup_status(describe_backup(backup_file))
+                
+                rows.append((backup_file, backup_time, size_str, mod_time, status))
+            return rows
+        
+        # 在主线程中更新列表
+        def on_done(job):
+            if job.cancelled:
+                return
+            if job.error is not None:
+                self.status_var.set(f"读取备份列表出错: {job.error}")
+                return
             
-            self.backup_tree.insert("", "end", values=(backup_file.name, backup_time, size_str, mod_time), tags=(str(backup_file),))
+            # 清空当前列表
+            for item in self.backup_tree.get_children():
+                self.backup_tree.delete(item)
+            
+            # 如果没有找到备份文件
+            if not job.result:
+                self.status_var.set("未找到备份文件")
+                return
+            
+            # 显示备份文件
+            for backup_file, backup_time, size_str, mod_time, status in job.result:
+                self.backup_tree.insert("", "end", values=(backup_file.name, backup_time, size_str, mod_time, status), tags=(str(backup_file),))
+            
+            self.status_var.set(f"找到 {len(job.result)} 个备份文件")
         
-        self.status_var.set(f"找到 {len(backup_files)} 个备份文件")
+        self.jobs.submit("refresh", scan, group="backup_list", on_done=on_done)
     
     def restore_backup(self):
         """还原选中的备份"""
+        if self.restore_job is not None:
+            return
+        
         # 获取选中的项
         selected = self.backup_tree.selection()
         if not selected:
@@ -353,63 +594,61 @@ class ClashVergeApp:
         if not messagebox.askyesno("确认", f"确定要还原备份文件 {backup_name} 吗？"):
             return
         
-        # 禁用按钮
-        for widget in self.tab2.winfo_children():
-            if isinstance(widget, ttk.Frame):
-                for child in widget.winfo_children():
-                    if isinstance(child, ttk.Button):
-                        child.configure(state="disabled")
-        
+        self.restore_button.configure(state="disabled")
+        self.cancel_restore_button.configure(state="normal")
         self.status_var.set("正在还原备份...")
         
-        # 在新线程中运行，避免界面冻结
-        def run_restore():
-            try:
-                # 重定向输出
-                old_stdout = sys.stdout
-                sys.stdout = RedirectText(self.restore_text)
-                
-                print(f"正在还原备份: {backup_name}")
-                
-                # 还原备份
-                success, message = restore_backup(backup_path)
-                
-                if success:
-                    print(message)
-                    print("请重启Clash Verge以应用更改")
-                    self.show_message("成功", f"{message}\n请重启Clash Verge以应用更改")
-                else:
-                    print(f"还原失败: {message}")
-                    self.show_message("错误", f"还原失败: {message}")
+        log = self.restore_log
+        hot_reload = self.hot_reload_var.get()
+        
+        # 在后台任务中运行，避免界面冻结
+        def run_restore(token):
+            log.write(f"正在还原备份: {backup_name}")
+            return run_with_hot_reload(
+                lambda: restore_backup(backup_path, on_event=log, cancel_token=token),
+                hot_reload, on_event=log, cancel_token=token)
+        
+        # 任务结束后在主线程中处理结果
+        def on_done(job):
+            self.restore_job = None
+            self.restore_button.configure(state="normal")
+            self.cancel_restore_button.configure(state="disabled")
+            self.status_var.set("就绪")
             
-            except Exception as e:
-                import traceback
-                error_msg = traceback.format_exc()
-                print(f"执行还原脚本时出错: {e}")
-                print(error_msg)
-                self.show_message("错误", f"执行还原脚本时出错:\n{str(e)}")
+            if job.cancelled:
+                log.write("已取消还原")
+                return
+            if job.error is not None:
+                log.write(f"执行还原脚本时出错: {job.error}")
+                self.show_message("错误", f"执行还原脚本时出错:\n{str(job.error)}")
+                return
             
-            finally:
-                # 恢复标准输出
-                sys.stdout = old_stdout
-                
-                # 恢复按钮状态
-                def enable_buttons():
-                    for widget in self.tab2.winfo_children():
-                        if isinstance(widget, ttk.Frame):
-                            for child in widget.winfo_children():
-                                if isinstance(child, ttk.Button):
-                                    child.configure(state="normal")
-                    self.status_var.set("就绪")
-                
-                # 在主线程中恢复按钮状态
-                self.root.after(0, enable_buttons)
+            success, message, reloaded = job.result
+            if success:
+                log.write(message)
+                if reloaded:
+                    self.show_message("成功", f"{message}\n更改已立即生效")
+                else:
+                    log.write("请重启Clash Verge以应用更改")
+                    self.show_message("成功", f"{message}\n请重启Clash Verge以应用更改")
+                self.refresh_backup_list()
+            else:
+                log.write(f"还原失败: {message}")
+                self.show_message("错误", f"还原失败: {message}")
         
-        # 启动线程
-        threading.Thread(target=run_restore, daemon=True).start()
+        self.restore_job = self.jobs.submit("restore", run_restore, group="script", on_done=on_done)
+    
+    def cancel_restore(self):
+        """取消等待中或正在进行的还原任务"""
+        if self.restore_job is not None:
+            self.status_var.set("正在取消...")
+            self.restore_job.cancel()
 
 def main():
     """主函数"""
+    # 打包为exe时，本地导入使用的进程池需要此调用
+    multiprocessing.freeze_support()
+    
     root = tk.Tk()
     
     # 应用主题
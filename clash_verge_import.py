@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Clash Verge本地屏蔽列表导入模块 - 从本地hosts文件或目录并行提取Adobe域名
+"""
+
+import os
+import mmap
+import sys
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+# 导入核心模块
+from clash_verge_core import (
+    emit_event,
+    event_phase,
+    print_event,
+    check_cancelled,
+    EVENT_LOG,
+    EVENT_BYTES_RECEIVED,
+    EVENT_DOMAINS_PARSED
+)
+
+# 导入Adobe屏蔽模块
+from clash_verge_adobe_block import (
+    extract_adobe_domains,
+    modify_clash_verge_script
+)
+
+# 导入热重载模块
+from clash_verge_controller import run_with_hot_reload
+
+# 导入运行指标模块
+from clash_verge_metrics import (
+    record_run,
+    parse_metrics_dir
+)
+
+# 每个并行扫描块的大小
+IMPORT_CHUNK_SIZE = 8 * 1024 * 1024
+
+def collect_input_files(paths):
+    """展开文件和目录参数，返回按路径排序的非空文件列表"""
+    files = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            candidates = sorted(p for p in path.rglob("*") if p.is_file())
+        elif path.is_file():
+            candidates = [path]
+        else:
+            raise FileNotFoundError(f"文件或目录不存在: {path}")
+        for candidate in candidates:
+            if candidate.stat().st_size > 0:
+                files.append(candidate)
+    return files
+
+def split_chunks(path, chunk_size=IMPORT_CHUNK_SIZE):
+    """把文件按字节范围切分为扫描任务[(路径, 起始, 结束)]"""
+    size = os.path.getsize(path)
+    return [(str(path), start, min(start + chunk_size, size))
+            for start in range(0, size, chunk_size)]
+
+def scan_chunk(task):
+    """扫描文件的一个字节范围，返回其中的Adobe域名
+
+    每个块只处理起始位置落在[start, end)内的行：起点不在行首时跳到下一行，
+    终点落在行中间时读到该行结束，因此相邻块不会重复或遗漏跨界的行。
+    """
+    path, start, end = task
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if start > 0:
+                newline = mm.find(b"\n", start - 1)
+                if newline == -1 or newline >= end:
+                    return []
+                start = newline + 1
+            if start >= end:
+                return []
+            stop = mm.find(b"\n", end - 1)
+            stop = len(mm) if stop == -1 else stop + 1
+            content = mm[start:stop].decode("utf-8", errors="replace")
+    return extract_adobe_domains(content)
+
+def import_local_block_lists(paths, workers=None, on_event=None, cancel_token=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """从本地hosts文件或目录中提取Adobe域名
+
+    参数:
+        paths: 文件或目录路径列表，目录会被递归展开
+        workers: 进程池大小，默认使用全部CPU核心
+        on_event: 可选的进度事件回调，接收ProgressEvent
+        cancel_token: 可选的CancelToken
+        chunk_size: 每个扫描块的字节数
+
+    返回:
+        去重后的域名列表，保持首次出现的顺序
+    """
+    files = collect_input_files(paths)
+    tasks = []
+    for path in files:
+        tasks.extend(split_chunks(path, chunk_size))
+    total = sum(end - start for _, start, end in tasks)
+    emit_event(on_event, EVENT_LOG, f"正在扫描 {len(files)} 个文件，共 {total / (1024 * 1024):.1f} MB",
+               files=files, total=total)
+
+    # 只有一个块时直接在当前进程扫描，避免启动进程池的开销
+    if len(tasks) <= 1:
+        executor = None
+        futures = []
+        results = map(scan_chunk, tasks)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        futures = [executor.submit(scan_chunk, task) for task in tasks]
+        results = (future.result() for future in futures)
+
+    domains = []
+    seen = set()
+    received = 0
+    try:
+        for (path, start, end), chunk_domains in zip(tasks, results):
+            check_cancelled(cancel_token)
+            received += end - start
+            emit_event(on_event, EVENT_BYTES_RECEIVED, url=path, received=received, total=total)
+            for domain in chunk_domains:
+                if domain not in seen:
+                    seen.add(domain)
+                    domains.append(domain)
+    finally:
+        if executor is not None:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    emit_event(on_event, EVENT_DOMAINS_PARSED, f"从本地文件解析到 {len(domains)} 个Adobe相关域名",
+               count=len(domains))
+    return domains
+
+def main():
+    """主函数"""
+    print("Clash Verge本地屏蔽列表导入工具")
+    print("-" * 50)
+
+    hot_reload = "--reload" in sys.argv[1:]
+    metrics_dir = parse_metrics_dir(sys.argv[1:])
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not paths:
+        print("用法: clash_verge_import.py [--reload] [--metrics-dir=目录] <hosts文件或目录> [...]")
+        return
+
+    def run(on_event):
+        with event_phase(on_event, "scan"):
+            domains = import_local_block_lists(paths, on_event=on_event)
+        if not domains:
+            return False, "未在指定文件中找到Adobe相关域名", False
+
+        return run_with_hot_reload(lambda: modify_clash_verge_script(domains, on_event=on_event),
+                                   hot_reload, on_event=on_event)
+
+    try:
+        success, message, reloaded = record_run("import", run, metrics_dir, on_event=print_event)
+        if success:
+            print(message)
+            if reloaded:
+                print("Adobe屏蔽规则已应用并立即生效。")
+            else:
+                print("Adobe屏蔽规则已应用。请重启Clash Verge以生效。")
+        else:
+            print(f"错误: {message}")
+    except Exception as e:
+        print(f"发生错误: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Clash Verge运行指标模块 - 为node_exporter的textfile collector写入Prometheus格式的指标文件
+"""
+
+import os
+import time
+import socket
+import tempfile
+from pathlib import Path
+
+# 导入核心模块
+from clash_verge_core import (
+    get_clash_verge_directory,
+    find_backup_files,
+    emit_event,
+    EVENT_LOG,
+    EVENT_MIRROR_STARTED,
+    EVENT_MIRROR_FAILED,
+    EVENT_BYTES_RECEIVED,
+    EVENT_DOMAINS_PARSED,
+    EVENT_SCRIPT_WRITTEN,
+    EVENT_PHASE_FINISHED
+)
+
+# 指标名前缀
+METRIC_PREFIX = "disadober"
+
+def escape_label(value):
+    """按Prometheus文本格式转义标签值"""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+class MetricsRecorder:
+    """订阅进度事件并汇总一次运行的指标
+
+    作为on_event回调传给核心函数使用，事件会继续转发给on_event。
+    """
+    def __init__(self, operation, on_event=None):
+        self.operation = operation
+        self.on_event = on_event
+        self.started = time.time()
+        self.mirrors = {}
+        self.bytes_downloaded = 0
+        self.domains = None
+        self.rules = None
+        self.phases = {}
+        self._mirror_started = {}
+        self._received = {}
+
+    def __call__(self, event):
+        data = event.data
+        if event.kind == EVENT_MIRROR_STARTED:
+            self._mirror_started[data["url"]] = (data["proxy"], time.monotonic())
+        elif event.kind == EVENT_MIRROR_FAILED:
+            self.finish_mirror(data["url"], False)
+        elif event.kind == EVENT_BYTES_RECEIVED:
+            self._received[data["url"]] = data["received"]
+        elif event.kind == EVENT_DOMAINS_PARSED:
+            self.domains = data.get("count")
+            # 没有解析到域名时随后会收到EVENT_MIRROR_FAILED
+            if data.get("count"):
+                self.finish_mirror(data.get("url"), True)
+        elif event.kind == EVENT_SCRIPT_WRITTEN and "rules" in data:
+            self.rules = data["rules"]
+        elif event.kind == EVENT_PHASE_FINISHED:
+            self.phases[data["phase"]] = self.phases.get(data["phase"], 0.0) + data["duration"]
+
+        if self.on_event is not None:
+            self.on_event(event)
+
+    def finish_mirror(self, url, ok):
+        """记录一个代理的结果和耗时"""
+        if url not in self._mirror_started:
+            return
+        proxy, started = self._mirror_started.pop(url)
+        self.mirrors[proxy] = (ok, time.monotonic() - started)
+        self.bytes_downloaded += self._received.pop(url, 0)
+
+    def render(self, success, config_root=None, host=None):
+        """生成Prometheus文本格式的指标"""
+        if config_root is None:
+            config_root = get_clash_verge_directory()
+        if host is None:
+            host = socket.gethostname()
+
+        base = f'operation="{escape_label(self.operation)}",host="{escape_label(host)}",' \
+               f'config_root="{escape_label(config_root)}"'
+        lines = []
+
+        def metric(name, help_text, samples, metric_type="gauge"):
+            full_name = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for labels, value in samples:
+                label_text = base + "".join(f',{key}="{escape_label(v)}"' for key, v in labels.items())
+                lines.append(f"{full_name}{{{label_text}}} {value}")
+
+        metric("run_success", "Whether the last run succeeded.", [({}, int(bool(success)))])
+        metric("run_timestamp_seconds", "Unix time when the last run started.", [({}, f"{self.started:.3f}")])
+        metric("run_duration_seconds", "Wall time of the last run.",
+               [({}, f"{time.time() - self.started:.6f}")])
+
+        if self.phases:
+            metric("phase_duration_seconds", "Time spent in each phase of the last run.",
+                   [({"phase": phase}, f"{duration:.6f}") for phase, duration in self.phases.items()])
+        if self.mirrors:
+            metric("mirror_up", "Whether the mirror served a usable block list.",
+                   [({"mirror": proxy}, int(ok)) for proxy, (ok, _) in self.mirrors.items()])
+            metric("mirror_latency_seconds", "Time spent on each mirror attempt.",
+                   [({"mirror": proxy}, f"{latency:.6f}") for proxy, (_, latency) in self.mirrors.items()])
+        if self.mirrors or self.bytes_downloaded:
+            metric("download_bytes", "Bytes received from mirrors.", [({}, self.bytes_downloaded)])
+        if self.domains is not None:
+            metric("domains_parsed", "Domains parsed from the downloaded block list.", [({}, self.domains)])
+        if self.rules is not None:
+            metric("rules_emitted", "Rules written to the global script.", [({}, self.rules)])
+
+        backups = find_backup_files()
+        metric("backup_files", "Number of backup files in the profiles directory.", [({}, len(backups))])
+        metric("backup_bytes", "Total size of backup files in the profiles directory.",
+               [({}, sum(backup.stat().st_size for backup in backups))])
+        return "\n".join(lines) + "\n"
+
+    def write(self, textfile_dir, success):
+        """原子地写入指标文件，node_exporter不会读到写了一半的文件"""
+        textfile_dir = Path(textfile_dir)
+        target = textfile_dir / f"{METRIC_PREFIX}_{self.operation}.prom"
+        content = self.render(success)
+
+        fd, tmp_path = tempfile.mkstemp(dir=str(textfile_dir), prefix=f".{target.name}.")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, str(target))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        return target
+
+def run_success(result):
+    """从func的返回值判断运行是否成功"""
+    if isinstance(result, tuple):
+        return result[0]
+    if isinstance(result, dict):
+        return result.get("success", False)
+    return bool(result)
+
+def write_metrics(recorder, textfile_dir, success, on_event=None):
+    """写入指标文件，失败时通过EVENT_LOG报告而不是抛出异常"""
+    try:
+        recorder.write(textfile_dir, success)
+    except Exception as e:
+        emit_event(on_event, EVENT_LOG, f"写入指标文件失败: {e}", error=e)
+
+def record_run(operation, func, textfile_dir=None, on_event=None):
+    """执行func(on_event)，textfile_dir不为None时写入本次运行的指标
+
+    func的返回值为(成功状态, ...)元组时取第一个元素作为成功状态，为本地服务返回的字典时
+    取其中的success，否则按真值判断。
+    func抛出异常时同样写入失败的指标，然后重新抛出原来的异常。写入指标失败不影响
+    运行结果，只通过on_event报告。
+    """
+    if textfile_dir is None:
+        return func(on_event)
+
+    recorder = MetricsRecorder(operation, on_event)
+    try:
+        result = func(recorder)
+    except BaseException:
+        write_metrics(recorder, textfile_dir, False, on_event)
+        raise
+    write_metrics(recorder, textfile_dir, run_success(result), on_event)
+    return result
+
+def parse_metrics_dir(argv):
+    """从命令行参数中读取 --metrics-dir=目录，没有时返回None"""
+    for arg in argv:
+        if arg.startswith("--metrics-dir="):
+            return arg.split("=", 1)[1]
+    return None
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Clash Verge失效域名剔除模块 - 并发检查域名是否仍能解析，剔除多次确认失效的域名
+"""
+
+import os
+import json
+import time
+import random
+import socket
+import struct
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 导入核心模块
+from clash_verge_core import (
+    get_clash_verge_directory,
+    emit_event,
+    check_cancelled,
+    EVENT_LOG
+)
+
+# 解析结果
+DNS_ALIVE = "alive"
+DNS_DEAD = "dead"
+DNS_UNKNOWN = "unknown"
+
+# 并发解析的线程数
+PRUNE_WORKERS = 32
+
+# 解析结果的缓存时间（秒），缓存有效期内不重复解析
+PRUNE_CACHE_TTL = 24 * 3600
+
+# 连续多少次运行确认失效后剔除
+PRUNE_DEAD_RUNS = 3
+
+# 解析缓存文件
+PRUNE_CACHE_NAME = "disadober-dns-cache.json"
+
+class SystemResolver:
+    """使用系统解析器（getaddrinfo）检查域名
+
+    只有域名不存在（EAI_NONAME）视为失效。规则都是DOMAIN-SUFFIX，域名本身没有地址记录
+    （EAI_NODATA，例如只有子域名解析的区域顶点）不代表规则失效，视为未知。
+    """
+    def __call__(self, domain):
+        try:
+            socket.getaddrinfo(domain, None)
+            return DNS_ALIVE
+        except socket.gaierror as e:
+            if e.errno == socket.EAI_NONAME:
+                return DNS_DEAD
+            return DNS_UNKNOWN
+        except OSError:
+            return DNS_UNKNOWN
+
+class DnsResolver:
+    """直接向指定DNS服务器发送A记录查询，不经过系统缓存
+
+    只有NXDOMAIN视为失效。没有应答记录的NOERROR（NODATA）说明域名存在，只是没有A记录，
+    其子域名仍可能被DOMAIN-SUFFIX规则命中，因此与超时和其他错误一样视为未知。
+    """
+    def __init__(self, server, port=53, timeout=2.0):
+        self.server = server
+        self.port = port
+        self.timeout = timeout
+
+    def build_query(self, domain, query_id):
+        """构造DNS查询报文"""
+        header = struct.pack(">HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+        labels = [label.encode('ascii') for label in domain.rstrip(".").split(".")]
+        qname = b"".join(bytes([len(label)]) + label for label in labels) + b"\0"
+        return header + qname + struct.pack(">HH", 1, 1)
+
+    def __call__(self, domain):
+        try:
+            query_id = random.randint(0, 0xFFFF)
+            packet = self.build_query(domain, query_id)
+        except (UnicodeEncodeError, ValueError):
+            return DNS_UNKNOWN
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.sendto(packet, (self.server, self.port))
+            while True:
+                response, _ = sock.recvfrom(4096)
+                if len(response) >= 12 and struct.unpack(">H", response[:2])[0] == query_id:
+                    break
+        except OSError:
+            return DNS_UNKNOWN
+        finally:
+            sock.close()
+
+        flags, _, answers = struct.unpack(">HHH", response[2:8])
+        rcode = flags & 0x0F
+        if rcode == 3:
+            return DNS_DEAD
+        if rcode != 0:
+            return DNS_UNKNOWN
+        return DNS_ALIVE if answers > 0 else DNS_UNKNOWN
+
+def load_prune_cache(cache_path):
+    """读取解析缓存，文件不存在或损坏时返回空字典"""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_prune_cache(cache_path, cache):
+    """原子地写入解析缓存"""
+    fd, tmp_path = tempfile.mkstemp(dir=str(cache_path.parent), prefix=".dns-cache-")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(tmp_path, str(cache_path))
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+def prune_dead_domains(domains, resolver=None, workers=PRUNE_WORKERS, ttl=PRUNE_CACHE_TTL,
+                       dead_runs=PRUNE_DEAD_RUNS, cache_path=None, drop=True,
+                       on_event=None, cancel_token=None):
+    """并发检查域名，剔除连续多次运行都确认不存在的域名
+
+    每个域名在缓存有效期内只解析一次。每次实际解析为失效（域名不存在）时，该域名的失效次数加一，
+    解析成功时清零；失效次数达到dead_runs的域名视为已失效。无法判断的结果不计入。
+
+    参数:
+        domains: 域名列表
+        resolver: 可调用对象，接收域名返回DNS_ALIVE/DNS_DEAD/DNS_UNKNOWN，默认使用系统解析器
+        workers: 并发解析的线程数
+        ttl: 解析结果的缓存时间（秒）
+        dead_runs: 剔除前需要确认失效的次数
+        cache_path: 缓存文件路径，默认位于Clash Verge配置目录
+        drop: 为False时只标记失效域名而不剔除
+        on_event: 可选的进度事件回调
+        cancel_token: 可选的CancelToken
+
+    返回:
+        (保留的域名列表, 已失效的域名列表)
+    """
+    if resolver is None:
+        resolver = SystemResolver()
+    if cache_path is None:
+        cache_path = get_clash_verge_directory() / PRUNE_CACHE_NAME
+
+    cache = load_prune_cache(cache_path)
+    now = time.time()
+
+    # 只解析缓存中没有或已过期的域名
+    pending = []
+    for domain in dict.fromkeys(d.lower() for d in domains):
+        entry = cache.get(domain)
+        if entry is None or now - entry.get("checked", 0) >= ttl:
+            pending.append(domain)
+
+    emit_event(on_event, EVENT_LOG, f"正在检查 {len(pending)} 个域名的解析情况（{len(domains) - len(pending)} 个使用缓存）",
+               pending=len(pending))
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(resolver, domain): domain for domain in pending}
+            try:
+                for future in as_completed(futures):
+                    check_cancelled(cancel_token)
+                    domain = futures[future]
+                    try:
+                        status = future.result()
+                    except Exception:
+                        status = DNS_UNKNOWN
+                    entry = cache.setdefault(domain, {"dead_runs": 0})
+                    if status == DNS_UNKNOWN:
+                        continue
+                    entry["checked"] = now
+                    entry["status"] = status
+                    entry["dead_runs"] = entry.get("dead_runs", 0) + 1 if status == DNS_DEAD else 0
+            finally:
+                for future in futures:
+                    future.cancel()
+        save_prune_cache(cache_path, cache)
+
+    kept = []
+    dead = []
+    for domain in domains:
+        if cache.get(domain.lower(), {}).get("dead_runs", 0) >= dead_runs:
+            dead.append(domain)
+            if drop:
+                continue
+        kept.append(domain)
+
+    action = "已剔除" if drop else "已标记"
+    emit_event(on_event, EVENT_LOG, f"{action} {len(dead)} 个多次确认无法解析的域名", dead=dead)
+    return kept, dead
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Clash Verge规则回放模块 - 用连接日志或主机名列表统计规则命中率和匹配开销
+"""
+
+import re
+import sys
+from collections import Counter
+
+# 导入核心模块
+from clash_verge_core import (
+    get_clash_verge_directory,
+    find_global_script,
+    emit_event,
+    print_event,
+    check_cancelled,
+    EVENT_LOG
+)
+
+# 导入Adobe屏蔽模块
+from clash_verge_adobe_block import extract_script_rules
+
+# 导入域名过滤模块
+from clash_verge_filter import DEFAULT_FILTER
+
+# 导入热重载模块
+from clash_verge_controller import (
+    read_config_rules,
+    RUNTIME_CONFIG_NAME
+)
+
+# 每批处理的行数
+REPLAY_BATCH_SIZE = 100000
+
+# 连接日志中的目标地址，例如 "[TCP] 127.0.0.1:50000 --> activate.adobe.com:443 match ..."
+LOG_TARGET_PATTERN = re.compile(r"-->\s*\[?([^\s\]]+?)\]?(?::\d+)?(?:\s|$)")
+
+# 只包含一个主机名（可带端口）的行
+HOST_LINE_PATTERN = re.compile(r"^([A-Za-z0-9._-]+)(?::\d+)?$")
+
+def parse_rule(rule):
+    """解析规则字符串，返回(类型, 匹配内容, 目标)"""
+    parts = [part.strip() for part in rule.split(",")]
+    rule_type = parts[0].upper()
+    if rule_type in ("MATCH", "FINAL"):
+        return rule_type, "", parts[1] if len(parts) > 1 else ""
+    payload = parts[1] if len(parts) > 1 else ""
+    target = parts[2] if len(parts) > 2 else ""
+    return rule_type, payload, target
+
+def extract_host(line):
+    """从日志行中提取主机名，无法识别时返回None"""
+    m = LOG_TARGET_PATTERN.search(line)
+    if m is None:
+        m = HOST_LINE_PATTERN.match(line.strip())
+    if m is None:
+        return None
+    return m.group(1).lower().rstrip(".")
+
+class RuleMatcher:
+    """按Clash的顺序匹配语义（第一条命中的规则生效）查找主机名命中的规则
+
+    DOMAIN和DOMAIN-SUFFIX规则建立索引，DOMAIN-KEYWORD逐条检查，
+    得到与逐条线性匹配相同的结果，但不需要真的遍历全部规则。
+    无法仅凭主机名判断的规则（IP-CIDR、GEOIP、RULE-SET等）视为不命中，但计入比较次数。
+    """
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.domains = {}
+        self.suffixes = {}
+        self.keywords = []
+        self.match_all = None
+
+        for index, rule in enumerate(self.rules):
+            rule_type, payload, _ = parse_rule(rule)
+            payload = payload.lower()
+            if rule_type == "DOMAIN":
+                self.domains.setdefault(payload, index)
+            elif rule_type == "DOMAIN-SUFFIX":
+                self.suffixes.setdefault(payload, index)
+            elif rule_type == "DOMAIN-KEYWORD":
+                self.keywords.append((index, payload))
+            elif rule_type in ("MATCH", "FINAL") and self.match_all is None:
+                self.match_all = index
+
+    def match(self, host):
+        """返回命中规则的索引，没有规则命中时返回None"""
+        best = self.domains.get(host)
+        if self.match_all is not None and (best is None or self.match_all < best):
+            best = self.match_all
+
+        # 检查主机名本身及其所有上级域名
+        suffix = host
+        while True:
+            index = self.suffixes.get(suffix)
+            if index is not None and (best is None or index < best):
+                best = index
+            dot = suffix.find(".")
+            if dot == -1:
+                break
+            suffix = suffix[dot + 1:]
+
+        for index, keyword in self.keywords:
+            if best is not None and index >= best:
+                break
+            if keyword in host:
+                best = index
+        return best
+
+class ReplayReport:
+    """回放统计结果"""
+    def __init__(self, rules, tool_rule_count):
+        self.rules = rules
+        self.tool_rule_count = tool_rule_count
+        self.hits = [0] * len(rules)
+        self.lookups = 0
+        self.unmatched = 0
+        self.skipped_lines = 0
+        self.comparisons = 0
+        self.unique_hosts = set()
+        self.unmatched_vendor_hosts = Counter()
+
+    @property
+    def comparisons_per_lookup(self):
+        return self.comparisons / self.lookups if self.lookups else 0.0
+
+    def dead_tool_rules(self):
+        """返回本工具生成但从未命中的规则"""
+        return [rule for rule, hits in zip(self.rules[:self.tool_rule_count], self.hits) if hits == 0]
+
+    def format(self, top=20):
+        """格式化为可读的文本报告"""
+        lines = [
+            f"查询次数: {self.lookups}",
+            f"不同主机名: {len(self.unique_hosts)}",
+            f"无法识别的行: {self.skipped_lines}",
+            f"未命中任何规则: {self.unmatched}",
+            f"平均每次查询的规则比较次数（线性匹配模型）: {self.comparisons_per_lookup:.1f}",
+            "",
+            "本工具生成的规则命中次数:",
+        ]
+        for rule, hits in zip(self.rules[:self.tool_rule_count], self.hits):
+            lines.append(f"  {hits:>10}  {rule}")
+
+        dead = self.dead_tool_rules()
+        lines.append("")
+        lines.append(f"从未命中的规则: {len(dead)} / {self.tool_rule_count}")
+
+        if self.unmatched_vendor_hosts:
+            lines.append("")
+            lines.append("未被屏蔽规则命中的可疑主机名:")
+            for host, count in self.unmatched_vendor_hosts.most_common(top):
+                lines.append(f"  {count:>10}  {host}")
+        return "\n".join(lines)
+
+def replay_lines(lines, tool_rules, user_rules=(), domain_filter=None,
+                 batch_size=REPLAY_BATCH_SIZE, on_event=None, cancel_token=None):
+    """回放日志行并统计规则命中情况
+
+    规则顺序与生成脚本中的main(config)一致：本工具的规则在前，用户规则在后。
+
+    参数:
+        lines: 可迭代的日志行或主机名
+        tool_rules: 本工具生成的规则列表
+        user_rules: 运行时配置中的用户规则
+        domain_filter: 用于识别可疑主机名的DomainFilter，默认只包含Adobe规则
+        batch_size: 每批处理的行数
+        on_event: 可选的进度事件回调
+        cancel_token: 可选的CancelToken
+
+    返回:
+        ReplayReport
+    """
+    if domain_filter is None:
+        domain_filter = DEFAULT_FILTER
+
+    rules = list(tool_rules) + list(user_rules)
+    matcher = RuleMatcher(rules)
+    report = ReplayReport(rules, len(tool_rules))
+    results = {}
+
+    def flush(batch):
+        # 每批内先按主机名聚合，同一主机名只匹配一次
+        for host, count in batch.items():
+            if host not in results:
+                results[host] = matcher.match(host)
+            index = results[host]
+            report.lookups += count
+            if index is None:
+                report.unmatched += count
+                report.comparisons += len(rules) * count
+            else:
+                report.hits[index] += count
+                report.comparisons += (index + 1) * count
+            if (index is None or index >= report.tool_rule_count) and domain_filter.match(host):
+                report.unmatched_vendor_hosts[host] += count
+        report.unique_hosts.update(batch)
+
+    batch = Counter()
+    pending = 0
+    processed = 0
+    for line in lines:
+        host = extract_host(line)
+        if host is None:
+            report.skipped_lines += 1
+        else:
+            batch[host] += 1
+        pending += 1
+        if pending >= batch_size:
+            check_cancelled(cancel_token)
+            flush(batch)
+            processed += pending
+            emit_event(on_event, EVENT_LOG, f"已处理 {processed} 行", processed=processed)
+            batch = Counter()
+            pending = 0
+    flush(batch)
+    return report
+
+def load_current_rules(config_dir=None):
+    """读取当前全局脚本生成的规则和运行时配置中的用户规则
+
+    返回:
+        (本工具规则, 用户规则)
+    """
+    if config_dir is None:
+        config_dir = get_clash_verge_directory()
+
+    script_path = find_global_script()
+    tool_rules = []
+    if script_path:
+        tool_rules = extract_script_rules(script_path.read_text(encoding='utf-8')) or []
+
+    user_rules = []
+    runtime_path = config_dir / RUNTIME_CONFIG_NAME
+    if runtime_path.exists():
+        # 运行时配置中可能已包含脚本插入的规则，去掉它们只保留用户规则
+        tool_set = set(tool_rules)
+        user_rules = [rule for rule in read_config_rules(runtime_path.read_text(encoding='utf-8'))
+                      if rule not in tool_set]
+    return tool_rules, user_rules
+
+def main():
+    """主函数"""
+    print("Clash Verge规则回放工具")
+    print("-" * 50)
+
+    if len(sys.argv) < 2:
+        print("用法: clash_verge_replay.py <连接日志或主机名列表> [...]")
+        return
+
+    try:
+        tool_rules, user_rules = load_current_rules()
+        if not tool_rules:
+            print("当前全局脚本不是由本工具生成，无法统计屏蔽规则")
+            return
+        print(f"本工具规则 {len(tool_rules)} 条，用户规则 {len(user_rules)} 条")
+
+        def read_all(paths):
+            for path in paths:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    yield from f
+
+        report = replay_lines(read_all(sys.argv[1:]), tool_rules, user_rules, on_event=print_event)
+        print()
+        print(report.format())
+    except Exception as e:
+        print(f"发生错误: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Clash Verge本地服务模块 - 通过Unix域套接字提供JSON-RPC接口，在多次调用之间保留已解析的状态
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import stat
+import socket
+import threading
+import socketserver
+from pathlib import Path
+
+# 导入核心模块
+from clash_verge_core import (
+    get_clash_verge_directory,
+    get_profiles_directory,
+    find_global_script,
+    find_backup_files,
+    extract_backup_time,
+    describe_backup,
+    restore_backup,
+    rollback_script,
+    emit_event,
+    print_event,
+    EVENT_LOG,
+    EVENT_MIRROR_STARTED,
+    EVENT_MIRROR_FAILED,
+    EVENT_DOMAINS_PARSED
+)
+
+# 导入Adobe屏蔽模块
+from clash_verge_adobe_block import (
+    modify_clash_verge_script,
+    download_vendor_block_lists,
+    extract_script_rules,
+    GITHUB_PROXIES,
+    BUILTIN_ADOBE_DOMAINS
+)
+
+# 导入域名过滤模块
+from clash_verge_filter import (
+    DomainFilter,
+    DEFAULT_FILTER,
+    load_vendor_rules
+)
+
+# 导入热重载模块
+from clash_verge_controller import (
+    run_with_hot_reload
+)
+
+# 导入规则回放模块
+from clash_verge_replay import RuleMatcher
+
+# 服务套接字所在的目录（位于Clash Verge配置目录下，仅当前用户可访问）和文件名
+SERVICE_DIR_NAME = "disadober"
+SERVICE_SOCKET_NAME = "service.sock"
+
+# 已下载域名列表的缓存时间（秒）
+DOMAIN_CACHE_TTL = 3600
+
+# JSON-RPC错误码
+RPC_PARSE_ERROR = -32700
+RPC_METHOD_NOT_FOUND = -32601
+RPC_INVALID_PARAMS = -32602
+RPC_INTERNAL_ERROR = -32603
+
+# 各方法接受的参数：{参数名: (允许的类型, 是否必需)}，可选参数也可以为null
+RPC_PARAMS = {
+    "apply": {"domains": (list, False), "refresh": (bool, False), "hot_reload": (bool, False),
+              "rules_path": (str, False), "prune": (bool, False)},
+    "restore": {"index": (int, False), "name": (str, False), "hot_reload": (bool, False)},
+    "rollback": {"hot_reload": (bool, False)},
+    "list": {},
+    "query": {"domain": (str, True)},
+    "status": {},
+}
+
+# 没有Unix域套接字的平台（Windows）上仍需能导入本模块，此时服务不可用
+UnixStreamServer = getattr(socketserver, "UnixStreamServer", object)
+
+class ServiceError(Exception):
+    """服务调用失败"""
+    def __init__(self, message, code=RPC_INTERNAL_ERROR):
+        super().__init__(message)
+        self.code = code
+
+def get_service_socket_path():
+    """获取服务套接字路径
+
+    位于当前用户的Clash Verge配置目录下，与环境变量无关，
+    因此从桌面会话启动的服务也能被cron等环境中的客户端找到。
+    """
+    return get_clash_verge_directory() / SERVICE_DIR_NAME / SERVICE_SOCKET_NAME
+
+def prepare_service_directory(directory):
+    """创建只有当前用户可以访问的套接字目录，目录属于其他用户时抛出ServiceError"""
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    st = os.lstat(str(directory))
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise ServiceError(f"服务目录不属于当前用户: {directory}")
+    if stat.S_IMODE(st.st_mode) != 0o700:
+        os.chmod(str(directory), 0o700)
+
+def check_socket_owner(path):
+    """确认套接字属于当前用户，防止连接到其他用户伪造的服务"""
+    st = os.lstat(str(path))
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        raise ServiceError(f"服务套接字不属于当前用户: {path}")
+
+def service_supported():
+    """当前平台是否支持Unix域套接字"""
+    return hasattr(socket, "AF_UNIX")
+
+def validate_params(method, params):
+    """按RPC_PARAMS检查参数，不合法时抛出RPC_INVALID_PARAMS错误"""
+    if not isinstance(params, dict):
+        raise ServiceError("params必须是JSON对象", RPC_INVALID_PARAMS)
+    spec = RPC_PARAMS.get(method, {})
+    for key in params:
+        if key not in spec:
+            raise ServiceError(f"{method} 不接受参数: {key}", RPC_INVALID_PARAMS)
+    for key, (expected, required) in spec.items():
+        value = params.get(key)
+        if value is None:
+            if required:
+                raise ServiceError(f"{method} 缺少参数: {key}", RPC_INVALID_PARAMS)
+            continue
+        # JSON中的true/false在Python中是int的子类，不能当作整数
+        if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+            raise ServiceError(f"参数 {key} 必须是 {expected.__name__}", RPC_INVALID_PARAMS)
+        if expected is list and not all(isinstance(item, str) for item in value):
+            raise ServiceError(f"参数 {key} 必须是字符串列表", RPC_INVALID_PARAMS)
+
+def event_to_json(event):
+    """把进度事件转换为可序列化的字典"""
+    return {"kind": event.kind, "message": event.message, "data": event.data}
+
+class ServiceState:
+    """服务在多次调用之间保留的状态
+
+    包括已下载并解析的域名、代理的最近结果（成功的代理优先尝试）、
+    全局脚本路径和备份列表（profiles目录未变化时直接复用）。
+
+    请求在各自的线程中处理：lock串行化修改脚本的操作，download_lock串行化下载，
+    cache_lock保护缓存的读写。
+    """
+    def __init__(self):
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.download_lock = threading.Lock()
+        self.cache_lock = threading.RLock()
+        self.vendor_domains = None
+        self.domains_fetched = None
+        self.domains_rules_path = None
+        self.mirrors = {}
+        self.script_path = None
+        self.script_rules = []
+        self.script_mtime = None
+        self.backups = None
+        self.backups_mtime = None
+        self._started_urls = {}
+
+    def track_mirror(self, on_event):
+        """包装事件回调，记录每个代理的最近结果"""
+        def handler(event):
+            with self.cache_lock:
+                if event.kind == EVENT_MIRROR_STARTED:
+                    self._started_urls[event.data["url"]] = (event.data["proxy"], time.time())
+                elif event.kind == EVENT_MIRROR_FAILED:
+                    self._started_urls.pop(event.data["url"], None)
+                    self.mirrors[event.data["proxy"]] = {"ok": False, "error": str(event.data["error"]),
+                                                         "checked": time.time()}
+                elif (event.kind == EVENT_DOMAINS_PARSED and event.data.get("count")
+                      and event.data.get("url") in self._started_urls):
+                    proxy, started = self._started_urls.pop(event.data["url"])
+                    self.mirrors[proxy] = {"ok": True, "latency": time.time() - started,
+                                           "checked": time.time()}
+            if on_event is not None:
+                on_event(event)
+        return handler
+
+    def ordered_proxies(self):
+        """按最近结果排序的代理列表：成功的按延迟排在前面，失败的排在最后"""
+        mirrors = self.get_mirrors()
+
+        def key(proxy):
+            state = mirrors.get(proxy)
+            if state is None:
+                return (1, 0.0)
+            if state["ok"]:
+                return (0, state["latency"])
+            return (2, 0.0)
+        return sorted(GITHUB_PROXIES, key=key)
+
+    def get_mirrors(self):
+        """返回代理最近结果的副本"""
+        with self.cache_lock:
+            return {proxy: dict(state) for proxy, state in self.mirrors.items()}
+
+    def get_vendor_domains(self, domain_filter, rules_path, refresh, on_event):
+        """返回缓存的厂商域名，缓存过期、规则变化或要求刷新时重新下载
+
+        同时只有一个请求在下载；等待期间其他请求刚下载完成时，即使要求刷新也直接使用其结果。
+        """
+        requested = time.time()
+        with self.download_lock:
+            with self.cache_lock:
+                cached = self.vendor_domains
+                fresh = (cached is not None
+                         and self.domains_rules_path == rules_path
+                         and time.time() - self.domains_fetched < DOMAIN_CACHE_TTL)
+                reuse = fresh and (not refresh or self.domains_fetched >= requested)
+            if reuse:
+                emit_event(on_event, EVENT_LOG, "使用已缓存的屏蔽名单")
+                return cached
+
+            vendor_domains = download_vendor_block_lists(domain_filter, self.track_mirror(on_event),
+                                                         proxies=self.ordered_proxies())
+            if vendor_domains:
+                with self.cache_lock:
+                    self.vendor_domains = vendor_domains
+                    self.domains_fetched = time.time()
+                    self.domains_rules_path = rules_path
+            return vendor_domains
+
+    def get_script_path(self):
+        """返回缓存的全局脚本路径，文件不存在时重新查找"""
+        with self.cache_lock:
+            if self.script_path is None or not self.script_path.exists():
+                self.script_path = find_global_script()
+            return self.script_path
+
+    def get_script_rules(self):
+        """返回当前脚本中由本工具生成的规则，脚本未修改时直接复用"""
+        with self.cache_lock:
+            script_path = self.get_script_path()
+            mtime = script_path.stat().st_mtime_ns if script_path else None
+            if mtime != self.script_mtime:
+                script_rules = []
+                if script_path:
+                    script_rules = extract_script_rules(script_path.read_text(encoding='utf-8')) or []
+                self.script_rules = script_rules
+                self.script_mtime = mtime
+            return self.script_rules
+
+    def get_backups(self):
+        """返回备份列表，profiles目录修改时间不变时直接复用"""
+        profiles_dir = get_profiles_directory()
+        with self.cache_lock:
+            mtime = profiles_dir.stat().st_mtime_ns if profiles_dir.exists() else None
+            if self.backups is None or mtime != self.backups_mtime:
+                backups = []
+                for backup in find_backup_files():
+                    entry = {
+                        "name": backup.name,
+                        "time": extract_backup_time(backup),
+                        "size": backup.stat().st_size,
+                    }
+                    entry.update(describe_backup(backup))
+                    backups.append(entry)
+                self.backups = backups
+                self.backups_mtime = mtime
+            return self.backups
+
+class ServiceHandler(socketserver.StreamRequestHandler):
+    """处理一个连接上的JSON-RPC请求，每行一个请求
+
+    调用过程中的进度事件以"event"通知的形式先于结果发送。
+    """
+    def send(self, message):
+        self.wfile.write(json.dumps(message, ensure_ascii=False, default=str).encode('utf-8') + b"\n")
+        self.wfile.flush()
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line.decode('utf-8'))
+            except ValueError as e:
+                self.send({"jsonrpc": "2.0", "id": None,
+                           "error": {"code": RPC_PARSE_ERROR, "message": f"无法解析请求: {e}"}})
+                continue
+
+            request_id = request.get("id")
+
+            def on_event(event):
+                self.send({"jsonrpc": "2.0", "method": "event", "params": event_to_json(event)})
+
+            try:
+                result = self.server.dispatch(request.get("method"), request.get("params") or {}, on_event)
+                self.send({"jsonrpc": "2.0", "id": request_id, "result": result})
+            except ServiceError as e:
+                self.send({"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": str(e)}})
+            except Exception as e:
+                self.send({"jsonrpc": "2.0", "id": request_id,
+                           "error": {"code": RPC_INTERNAL_ERROR, "message": f"服务内部错误: {e}"}})
+
+class ClashVergeService(socketserver.ThreadingMixIn, UnixStreamServer):
+    """Clash Verge本地JSON-RPC服务"""
+    daemon_threads = True
+
+    def __init__(self, socket_path=None):
+        if socket_path is None:
+            socket_path = get_service_socket_path()
+            prepare_service_directory(socket_path.parent)
+        self.socket_path = Path(socket_path)
+        self.state = ServiceState()
+        self.methods = {
+            "apply": self.rpc_apply,
+            "restore": self.rpc_restore,
+            "rollback": self.rpc_rollback,
+            "list": self.rpc_list,
+            "query": self.rpc_query,
+            "status": self.rpc_status,
+        }
+        # 在限制性的umask下创建套接字，创建后立即只有当前用户可以连接
+        old_umask = os.umask(0o077)
+        try:
+            super().__init__(str(self.socket_path), ServiceHandler)
+        finally:
+            os.umask(old_umask)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            self.socket_path.unlink()
+        except OSError:
+            pass
+
+    def dispatch(self, method, params, on_event):
+        """调用对应的RPC方法"""
+        handler = self.methods.get(method)
+        if handler is None:
+            raise ServiceError(f"未知的方法: {method}", RPC_METHOD_NOT_FOUND)
+        validate_params(method, params)
+        return handler(on_event=on_event, **params)
+
+    def run_change(self, change, hot_reload, on_event):
+        """执行修改脚本的操作，写操作之间串行"""
+        with self.state.lock:
+            success, message, reloaded = run_with_hot_reload(change, hot_reload, on_event=on_event)
+            return {"success": success, "message": message, "reloaded": reloaded}
+
+    def rpc_apply(self, on_event, domains=None, refresh=False, hot_reload=False, rules_path=None, prune=False):
+        """应用屏蔽规则；未提供domains时使用缓存或下载的屏蔽名单"""
+        try:
+            domain_filter = DomainFilter(load_vendor_rules(rules_path)) if rules_path else None
+        except (OSError, ValueError) as e:
+            raise ServiceError(f"无法加载厂商规则: {e}", RPC_INVALID_PARAMS)
+        vendor_domains = None
+        if domains is None:
+            vendor_domains = self.state.get_vendor_domains(domain_filter, rules_path, refresh, on_event) or {}
+            domains = vendor_domains.get("adobe")
+            if not domains:
+                emit_event(on_event, EVENT_LOG, "使用内置的Adobe域名列表")
+                domains = BUILTIN_ADOBE_DOMAINS
+
+        return self.run_change(
+            lambda: modify_clash_verge_script(domains, on_event=on_event, domain_filter=domain_filter,
+                                              vendor_domains=vendor_domains, prune=prune),
+            hot_reload, on_event)
+
+    def rpc_restore(self, on_event, index=None, name=None, hot_reload=False):
+        """按索引（从1开始，与list的顺序一致）或文件名还原备份
+
+        文件名只能是list返回的备份之一，不接受路径。
+        """
+        backups = self.state.get_backups()
+        if name is None:
+            if index is None or not 1 <= index <= len(backups):
+                raise ServiceError("无效的备份索引", RPC_INVALID_PARAMS)
+            name = backups[index - 1]["name"]
+        elif not any(backup["name"] == name for backup in backups):
+            raise ServiceError(f"备份文件不存在: {name}", RPC_INVALID_PARAMS)
+        backup_path = get_profiles_directory() / name
+        return self.run_change(lambda: restore_backup(backup_path, on_event=on_event), hot_reload, on_event)
+
+    def rpc_rollback(self, on_event, hot_reload=False):
+        """通过重命名撤销最近一次修改"""
+        return self.run_change(lambda: rollback_script(on_event=on_event), hot_reload, on_event)
+
+    def rpc_list(self, on_event):
+        """列出备份文件"""
+        return self.state.get_backups()
+
+    def rpc_query(self, on_event, domain):
+        """查询域名所属的厂商，以及当前脚本中第一条命中它的规则"""
+        domain = domain.strip().lower().rstrip(".")
+        rules = self.state.get_script_rules()
+        index = RuleMatcher(rules).match(domain)
+        cached = self.state.vendor_domains or {}
+        return {
+            "domain": domain,
+            "vendor": DEFAULT_FILTER.match(domain),
+            "in_block_list": any(domain in (d.lower() for d in domains) for domains in cached.values()),
+            "rule": rules[index] if index is not None else None,
+        }
+
+    def rpc_status(self, on_event):
+        """返回服务状态和缓存情况"""
+        state = self.state
+        script_path = state.get_script_path()
+        return {
+            "pid": os.getpid(),
+            "uptime": time.time() - state.started,
+            "script": str(script_path) if script_path else None,
+            "cached_domains": {vendor: len(domains) for vendor, domains in (state.vendor_domains or {}).items()},
+            "cache_age": time.time() - state.domains_fetched if state.domains_fetched else None,
+            "mirrors": state.get_mirrors(),
+            "backups": len(state.get_backups()),
+        }
+
+def call_service(method, params=None, on_event=None, socket_path=None, timeout=None):
+    """调用本地服务的方法，返回结果；服务返回错误时抛出ServiceError
+
+    调用过程中服务发送的进度事件会转换为ProgressEvent传给on_event。
+    套接字不属于当前用户时抛出ServiceError，不会连接。
+    """
+    path = socket_path or get_service_socket_path()
+    check_socket_owner(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(str(path))
+        request = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params or {}}
+        sock.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b"\n")
+
+        with sock.makefile("rb") as reader:
+            for line in reader:
+                message = json.loads(line.decode('utf-8'))
+                if message.get("method") == "event":
+                    event = message["params"]
+                    emit_event(on_event, event["kind"], event["message"], **event["data"])
+                    continue
+                if "error" in message:
+                    raise ServiceError(message["error"]["message"], message["error"]["code"])
+                return message["result"]
+        raise ServiceError("服务在返回结果前关闭了连接")
+    finally:
+        sock.close()
+
+def service_available(socket_path=None):
+    """检查本地服务是否正在运行"""
+    if not service_supported():
+        return False
+    path = Path(socket_path or get_service_socket_path())
+    if not path.exists():
+        return False
+    try:
+        call_service("status", socket_path=path, timeout=1)
+        return True
+    except Exception:
+        return False
+
+def serve(socket_path=None):
+    """启动服务并一直运行，直到收到中断信号"""
+    path = Path(socket_path or get_service_socket_path())
+    if socket_path is None:
+        prepare_service_directory(path.parent)
+    if service_available(path):
+        raise ServiceError(f"服务已在运行: {path}")
+    if path.exists():
+        # 上次异常退出留下的套接字文件
+        path.unlink()
+
+    server = ClashVergeService(path)
+    print(f"Clash Verge服务已启动: {path}")
+    
+    # 收到终止信号时正常退出，以便删除套接字文件
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main():
+    """主函数"""
+    if not service_supported():
+        print("当前平台不支持Unix域套接字")
+        return
+
+    if len(sys.argv) < 2:
+        print("用法: clash_verge_service.py serve")
+        print("      clash_verge_service.py <apply|restore|list|query|status> [JSON参数]")
+        return
+
+    try:
+        command = sys.argv[1]
+        if command == "serve":
+            serve()
+            return
+
+        params = json.loads(sys.argv[2]) if len(sys.argv) > 2 else {}
+        result = call_service(command, params, on_event=print_event)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    except Exception as e:
+        print(f"发生错误: {e}")
+
+if __name__ == "__main__":
+    main()
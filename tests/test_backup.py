@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""差异备份的往返测试"""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from clash_verge_core import (
+    backup_file,
+    backup_chain_depth,
+    describe_backup,
+    is_delta_backup,
+    load_delta,
+    read_backup,
+    read_text_exact,
+    restore_backup,
+    unique_backup_path,
+    BACKUP_CHAIN_LIMIT,
+    BACKUP_MODE_DELTA
+)
+
+class DeltaBackupTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.script = self.directory / "Script.js"
+
+    def write(self, content):
+        with open(self.script, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+
+    def backup(self, content):
+        self.write(content)
+        return backup_file(self.script, mode=BACKUP_MODE_DELTA)
+
+    def version(self, i):
+        return "".join(f"rule-{j}\n" for j in range(20) if j != i % 20) + f"// version {i}\n"
+
+    def test_round_trip_line_endings(self):
+        contents = [
+            "a\r\nb\r\nc\r\n",
+            "a\r\nb changed\r\nc\r\n",
+            "a\nb\nno trailing newline",
+            "a\nb\nno trailing newline\nmore",
+            "",
+            "mixed\r\nendings\nand\rcarriage",
+        ]
+        backups = [self.backup(content) for content in contents]
+        self.assertTrue(any(is_delta_backup(backup) for backup in backups))
+        for backup, content in zip(backups, contents):
+            self.assertEqual(read_backup(backup), content)
+
+    def test_keyframe_rollover(self):
+        count = BACKUP_CHAIN_LIMIT * 2 + 3
+        backups = [self.backup(self.version(i)) for i in range(count)]
+        depths = [backup_chain_depth(backup) for backup in backups]
+        self.assertEqual(depths[:BACKUP_CHAIN_LIMIT + 1], list(range(BACKUP_CHAIN_LIMIT)) + [0])
+        self.assertTrue(all(depth < BACKUP_CHAIN_LIMIT for depth in depths))
+        for i, backup in enumerate(backups):
+            self.assertEqual(read_backup(backup), self.version(i))
+
+    def test_restore_rebuilds_version(self):
+        backups = [self.backup(self.version(i)) for i in range(5)]
+        self.write("current\n")
+        success, message = restore_backup(backups[2], auto_backup=False)
+        self.assertTrue(success, message)
+        self.assertEqual(read_text_exact(self.script), self.version(2))
+
+    def test_missing_base(self):
+        backups = [self.backup(self.version(i)) for i in range(4)]
+        backups[0].unlink()
+        for backup in backups[1:]:
+            status = describe_backup(backup)
+            self.assertFalse(status["restorable"])
+            with self.assertRaises(FileNotFoundError):
+                read_backup(backup)
+        # 下一个备份不依赖已损坏的链，也不会重新使用被引用的文件名
+        self.assertNotEqual(unique_backup_path(self.script).name, backups[0].name)
+        new_backup = self.backup(self.version(9))
+        self.assertFalse(is_delta_backup(new_backup))
+        self.assertEqual(read_backup(new_backup), self.version(9))
+
+    def test_replaced_base(self):
+        backups = [self.backup(self.version(i)) for i in range(3)]
+        self.assertEqual(load_delta(backups[1])["base"], backups[0].name)
+        backups[0].write_text(self.version(7), encoding='utf-8')
+        with self.assertRaisesRegex(ValueError, "基准备份已被替换"):
+            read_backup(backups[2])
+        self.assertFalse(describe_backup(backups[1])["restorable"])
+        self.assertTrue(describe_backup(backups[0])["restorable"])
+
+if __name__ == "__main__":
+    unittest.main()
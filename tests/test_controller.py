@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""热重载的测试，使用本地的替身external-controller"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from clash_verge_adobe_block import create_adobe_block_script
+from clash_verge_controller import (
+    ClashController,
+    find_controller_settings,
+    hot_reload_script,
+    read_current_script_rules,
+    read_config_rules,
+    replace_config_rules,
+    rules_active,
+    run_with_hot_reload,
+    RUNTIME_CONFIG_NAME
+)
+
+USER_RULES = ["DOMAIN-SUFFIX,example.com,DIRECT", "MATCH,PROXY"]
+
+def parse_rules(rules):
+    result = []
+    for rule in rules:
+        parts = rule.split(",")
+        if len(parts) == 3:
+            result.append({"type": parts[0], "payload": parts[1], "proxy": parts[2]})
+        else:
+            result.append({"type": parts[0], "payload": "", "proxy": parts[-1]})
+    return result
+
+class StubController(BaseHTTPRequestHandler):
+    """记录PUT /configs的配置，并从中返回GET /rules的规则"""
+    payloads = []
+
+    def do_PUT(self):
+        if self.headers.get("Authorization") != "Bearer s3cret":
+            self.send_response(401)
+            self.end_headers()
+            return
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.payloads.append(body["payload"])
+        self.send_response(204)
+        self.end_headers()
+
+    def do_GET(self):
+        rules = read_config_rules(self.payloads[-1]) if self.payloads else []
+        body = json.dumps({"rules": parse_rules(rules)}).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def runtime_config(port, tool_rules):
+    lines = [f"external-controller: '0.0.0.0:{port}'", "secret: s3cret", "rules:"]
+    lines += [f"  - {rule}" for rule in list(tool_rules) + USER_RULES]
+    return "\n".join(lines) + "\n"
+
+class ConfigTextTest(unittest.TestCase):
+    def test_find_controller_settings(self):
+        config_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, config_dir)
+        self.assertEqual(find_controller_settings(config_dir), (None, None))
+        (config_dir / "config.yaml").write_text("external-controller: 127.0.0.1:9097\n", encoding='utf-8')
+        self.assertEqual(find_controller_settings(config_dir), ("http://127.0.0.1:9097", ""))
+        # 运行时配置优先，监听所有地址时通过回环地址访问
+        (config_dir / RUNTIME_CONFIG_NAME).write_text(runtime_config(9090, []), encoding='utf-8')
+        self.assertEqual(find_controller_settings(config_dir), ("http://127.0.0.1:9090", "s3cret"))
+
+    def test_replace_config_rules_twice(self):
+        base = ["DOMAIN-SUFFIX,old.adobe.com,REJECT"]
+        first = ["DOMAIN-SUFFIX,a.adobe.com,REJECT"]
+        second = ["DOMAIN-SUFFIX,b.adobe.com,REJECT", "DOMAIN-SUFFIX,c.adobe.com,REJECT"]
+        text = runtime_config(9090, base)
+        # 每次都基于磁盘上的运行时配置，并移除其中的原始规则
+        self.assertEqual(read_config_rules(replace_config_rules(text, first, base)), first + USER_RULES)
+        self.assertEqual(read_config_rules(replace_config_rules(text, second, base)), second + USER_RULES)
+
+    def test_replace_config_rules_keeps_indent(self):
+        text = "mode: rule\nrules:\n    - MATCH,PROXY\nproxies: []\n"
+        result = replace_config_rules(text, ["DOMAIN,x.adobe.com,REJECT"])
+        self.assertIn("    - DOMAIN,x.adobe.com,REJECT\n    - MATCH,PROXY\nproxies: []", result)
+
+    def test_rules_active(self):
+        expected = ["DOMAIN-SUFFIX,a.adobe.com,REJECT"]
+        self.assertTrue(rules_active(parse_rules(expected + USER_RULES), expected))
+        self.assertFalse(rules_active(parse_rules(USER_RULES), expected))
+        self.assertFalse(rules_active([], expected))
+
+class HotReloadTest(unittest.TestCase):
+    def setUp(self):
+        StubController.payloads = []
+        self.httpd = HTTPServer(("127.0.0.1", 0), StubController)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.port = self.httpd.server_address[1]
+
+        self.home = Path(tempfile.mkdtemp())
+        self.config_dir = self.home / ".config" / "clash-verge"
+        (self.config_dir / "profiles").mkdir(parents=True)
+        self.script = self.config_dir / "profiles" / "Script.js"
+        patcher = mock.patch.dict(os.environ, {"HOME": str(self.home)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        shutil.rmtree(self.home)
+
+    def write_script(self, domains):
+        self.script.write_text(create_adobe_block_script(domains), encoding='utf-8')
+
+    def test_consecutive_reloads(self):
+        self.write_script(["old.adobe.com"])
+        original = read_current_script_rules()
+        (self.config_dir / RUNTIME_CONFIG_NAME).write_text(runtime_config(self.port, original), encoding='utf-8')
+        controller = ClashController.from_local_config(self.config_dir)
+        self.assertEqual(controller.base_url, f"http://127.0.0.1:{self.port}")
+
+        def change(domains):
+            self.write_script(domains)
+            return True, "ok"
+
+        result = run_with_hot_reload(lambda: change(["a.adobe.com"]), True)
+        self.assertEqual(result, (True, "ok", True))
+        result = run_with_hot_reload(lambda: change(["b.adobe.com"]), True)
+        self.assertEqual(result, (True, "ok", True))
+
+        rules = read_config_rules(StubController.payloads[-1])
+        self.assertIn("DOMAIN-SUFFIX,b.adobe.com,REJECT", rules)
+        self.assertNotIn("DOMAIN-SUFFIX,a.adobe.com,REJECT", rules)
+        self.assertNotIn("DOMAIN-SUFFIX,old.adobe.com,REJECT", rules)
+        self.assertEqual(rules[-len(USER_RULES):], USER_RULES)
+        self.assertEqual(len(rules), len(read_current_script_rules()) + len(USER_RULES))
+
+    def test_reload_without_controller(self):
+        self.write_script(["a.adobe.com"])
+        (self.config_dir / RUNTIME_CONFIG_NAME).write_text("rules:\n  - MATCH,PROXY\n", encoding='utf-8')
+        reloaded, message = hot_reload_script([], config_dir=self.config_dir)
+        self.assertFalse(reloaded)
+        self.assertIn("external-controller", message)
+
+if __name__ == "__main__":
+    unittest.main()
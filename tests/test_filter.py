@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""厂商规则与脚本生成的测试"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from clash_verge_filter import DomainFilter, load_vendor_rules
+from clash_verge_adobe_block import (
+    BUILTIN_ADOBE_DOMAINS,
+    create_adobe_block_script,
+    extract_script_rules
+)
+
+HOSTS = "127.0.0.1 activate.adobe.com\n127.0.0.1 lic1.autodesk.com\n127.0.0.1 example.com\n"
+
+def load_rules(rules):
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(rules, f)
+    try:
+        return load_vendor_rules(path)
+    finally:
+        os.unlink(path)
+
+class VendorRulesTest(unittest.TestCase):
+    def test_rules_without_adobe_still_extract_adobe(self):
+        domain_filter = DomainFilter(load_rules({"autodesk": {"suffixes": ["autodesk.com"]}}))
+        self.assertEqual(domain_filter.extract(HOSTS),
+                         {"adobe": ["activate.adobe.com"], "autodesk": ["lic1.autodesk.com"]})
+
+    def test_adobe_rules_are_merged_with_defaults(self):
+        rules = load_rules({"adobe": {"suffixes": ["adobeereg.com"]}})
+        self.assertEqual(rules["adobe"], {"substrings": ["adobe"], "suffixes": ["adobeereg.com"]})
+
+    def test_builtin_domains_kept_with_vendor_domains(self):
+        script = create_adobe_block_script(BUILTIN_ADOBE_DOMAINS, {"autodesk": ["lic1.autodesk.com"]})
+        rules = extract_script_rules(script)
+        self.assertEqual(len(rules), 3 + len(BUILTIN_ADOBE_DOMAINS) + 1)
+
+    def test_overlapping_vendor_does_not_take_adobe_domains(self):
+        domain_filter = DomainFilter(load_rules({"x": {"regexes": ["^ac"]}}))
+        vendor_domains = domain_filter.extract(HOSTS + "127.0.0.1 account.example.org\n")
+        script = create_adobe_block_script(vendor_domains.get("adobe", []), vendor_domains)
+        adobe_section, x_section = script.split("// x屏蔽规则")
+        self.assertIn("activate.adobe.com", adobe_section)
+        self.assertIn("account.example.org", x_section)
+        self.assertNotIn("activate.adobe.com", x_section)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""本地屏蔽列表分块扫描的测试，与整个文件一次性解析的结果对比"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from clash_verge_adobe_block import extract_adobe_domains
+from clash_verge_import import split_chunks, scan_chunk, import_local_block_lists
+
+HOSTS_LINES = [
+    "# hosts",
+    "127.0.0.1 activate.adobe.com",
+    "127.0.0.1 example.com",
+    "",
+    "127.0.0.1 practivate.adobe.com",
+    "   127.0.0.1 ereg.adobe.com   ",
+    "127.0.0.1 lm.licenses.adobe.com",
+    "127.0.0.1 a.example.org",
+    "127.0.0.1 activate.adobe.com",
+    "127.0.0.1 na1r.services.adobe.com",
+    "127.0.0.1 adobeereg.com",
+]
+
+def dedupe(domains):
+    return list(dict.fromkeys(domains))
+
+def scan_in_chunks(path, chunk_size):
+    domains = []
+    for task in split_chunks(path, chunk_size):
+        domains.extend(scan_chunk(task))
+    return dedupe(domains)
+
+class ScanChunkTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_hosts(self, name, newline, trailing_newline):
+        content = newline.join(HOSTS_LINES) + (newline if trailing_newline else "")
+        path = self.dir / name
+        path.write_bytes(content.encode("utf-8"))
+        return path, content
+
+    def test_chunk_boundaries(self):
+        for newline in ("\n", "\r\n"):
+            for trailing_newline in (True, False):
+                path, content = self.write_hosts("hosts", newline, trailing_newline)
+                expected = extract_adobe_domains(content)
+                self.assertEqual(len(expected), 6)
+                # 块大小从1字节到大于文件，覆盖行被切在任意位置的情况
+                for chunk_size in range(1, len(content.encode("utf-8")) + 6):
+                    with self.subTest(newline=repr(newline), trailing_newline=trailing_newline,
+                                      chunk_size=chunk_size):
+                        self.assertEqual(scan_in_chunks(path, chunk_size), expected)
+
+    def test_process_pool(self):
+        first, first_content = self.write_hosts("a.txt", "\r\n", False)
+        second = self.dir / "b.txt"
+        second.write_bytes(b"127.0.0.1 3dns.adobe.com\n127.0.0.1 activate.adobe.com\n")
+        expected = dedupe(extract_adobe_domains(first_content) + ["3dns.adobe.com"])
+
+        self.assertGreater(len(split_chunks(first, 7)), 1)
+        self.assertEqual(import_local_block_lists([self.dir], workers=2, chunk_size=7), expected)
+        self.assertEqual(import_local_block_lists([self.dir]), expected)
+
+if __name__ == "__main__":
+    unittest.main()
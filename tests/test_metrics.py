@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""运行指标的测试"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from clash_verge_core import emit_event, EVENT_DOMAINS_PARSED, EVENT_LOG
+from clash_verge_metrics import escape_label, record_run, MetricsRecorder
+from clash_verge_adobe_block import try_download_vendor_domains_with_proxies
+
+class ListHandler(BaseHTTPRequestHandler):
+    """/empty下的路径返回不含Adobe域名的名单，其他路径返回正常的名单"""
+    def do_GET(self):
+        if self.path.startswith("/empty/"):
+            body = b"127.0.0.1 example.com\n"
+        else:
+            body = b"127.0.0.1 activate.adobe.com\n"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class RecordRunTest(unittest.TestCase):
+    def setUp(self):
+        self.home = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.home)
+        patcher = mock.patch.dict(os.environ, {"HOME": str(self.home)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.events = []
+
+    def test_writes_metrics(self):
+        def run(on_event):
+            emit_event(on_event, EVENT_DOMAINS_PARSED, count=7)
+            return True, "ok"
+        self.assertEqual(record_run("apply", run, str(self.home), on_event=self.events.append), (True, "ok"))
+        text = (self.home / "disadober_apply.prom").read_text(encoding='utf-8')
+        self.assertRegex(text, r'disadober_run_success\{operation="apply",[^}]*\} 1\n')
+        self.assertRegex(text, r'disadober_domains_parsed\{[^}]*\} 7\n')
+        self.assertEqual([event.kind for event in self.events], [EVENT_DOMAINS_PARSED])
+
+    def test_failure_is_recorded_and_reraised(self):
+        def run(on_event):
+            raise RuntimeError("boom")
+        with self.assertRaisesRegex(RuntimeError, "boom"):
+            record_run("restore", run, str(self.home))
+        text = (self.home / "disadober_restore.prom").read_text(encoding='utf-8')
+        self.assertRegex(text, r'disadober_run_success\{[^}]*\} 0\n')
+
+    def test_write_failure_keeps_original_error(self):
+        def run(on_event):
+            raise RuntimeError("boom")
+        missing = str(self.home / "missing")
+        with self.assertRaisesRegex(RuntimeError, "boom"):
+            record_run("apply", run, missing, on_event=self.events.append)
+        self.assertEqual([event.kind for event in self.events], [EVENT_LOG])
+
+    def test_write_failure_keeps_result(self):
+        missing = str(self.home / "missing")
+        result = record_run("apply", lambda on_event: (True, "ok"), missing, on_event=self.events.append)
+        self.assertEqual(result, (True, "ok"))
+        self.assertIn("写入指标文件失败", self.events[0].message)
+
+    def test_escape_label(self):
+        self.assertEqual(escape_label('C:\\a "b"\nc'), 'C:\\\\a \\"b\\"\\nc')
+
+class MirrorMetricsTest(unittest.TestCase):
+    def setUp(self):
+        home = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, home)
+        patcher = mock.patch.dict(os.environ, {"HOME": home, "no_proxy": "*"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.httpd = HTTPServer(("127.0.0.1", 0), ListHandler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.addCleanup(self.httpd.server_close)
+        self.addCleanup(self.httpd.shutdown)
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def test_mirror_without_domains_is_down(self):
+        recorder = MetricsRecorder("apply")
+        empty, good = self.base + "/empty", self.base + "/good"
+        vendor_domains, _ = try_download_vendor_domains_with_proxies(on_event=recorder, proxies=[empty, good])
+        self.assertEqual(vendor_domains, {"adobe": ["activate.adobe.com"]})
+        self.assertEqual({proxy: ok for proxy, (ok, _) in recorder.mirrors.items()}, {empty: False, good: True})
+
+        text = recorder.render(True)
+        self.assertRegex(text, r'disadober_mirror_up\{[^}]*mirror="%s"\} 0\n' % empty)
+        self.assertRegex(text, r'disadober_mirror_up\{[^}]*mirror="%s"\} 1\n' % good)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""失效域名剔除的测试，使用本地的替身DNS服务器"""
+
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from clash_verge_prune import (
+    DnsResolver,
+    load_prune_cache,
+    prune_dead_domains,
+    DNS_ALIVE,
+    DNS_DEAD,
+    DNS_UNKNOWN
+)
+
+class StubDnsServer:
+    """按域名返回固定结果的UDP DNS服务器
+
+    records中的值为"alive"（返回一条A记录）、"nxdomain"或"empty"（NOERROR但没有应答），
+    未列出的域名不回复。
+    """
+    def __init__(self, records):
+        self.records = records
+        self.queries = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                packet, address = self.sock.recvfrom(4096)
+            except OSError:
+                return
+            query_id = struct.unpack(">H", packet[:2])[0]
+            labels = []
+            offset = 12
+            while packet[offset]:
+                length = packet[offset]
+                labels.append(packet[offset + 1:offset + 1 + length].decode('ascii'))
+                offset += length + 1
+            question = packet[12:offset + 5]
+            domain = ".".join(labels)
+            self.queries.append(domain)
+
+            result = self.records.get(domain)
+            if result is None:
+                continue
+            rcode = 3 if result == "nxdomain" else 0
+            answers = 1 if result == "alive" else 0
+            response = struct.pack(">HHHHHH", query_id, 0x8180 | rcode, 1, answers, 0, 0) + question
+            if answers:
+                response += struct.pack(">HHHLH", 0xC00C, 1, 1, 60, 4) + bytes([127, 0, 0, 1])
+            self.sock.sendto(response, address)
+
+    def close(self):
+        self.sock.close()
+
+class PruneTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StubDnsServer({
+            "alive.adobe.com": "alive",
+            "gone.adobe.com": "nxdomain",
+            "empty.adobe.com": "empty",
+        })
+        self.resolver = DnsResolver("127.0.0.1", self.server.port, timeout=0.5)
+        self.directory = Path(tempfile.mkdtemp())
+        self.cache_path = self.directory / "cache.json"
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.directory)
+
+    def test_resolver(self):
+        self.assertEqual(self.resolver("alive.adobe.com"), DNS_ALIVE)
+        self.assertEqual(self.resolver("gone.adobe.com"), DNS_DEAD)
+        self.assertEqual(self.resolver("empty.adobe.com"), DNS_UNKNOWN)
+        self.assertEqual(self.resolver("silent.adobe.com"), DNS_UNKNOWN)
+
+    def prune(self, domains, ttl=0):
+        return prune_dead_domains(domains, resolver=self.resolver, ttl=ttl, dead_runs=3,
+                                  cache_path=self.cache_path)
+
+    def test_dead_runs_threshold(self):
+        domains = ["alive.adobe.com", "gone.adobe.com", "empty.adobe.com", "silent.adobe.com"]
+        for _ in range(2):
+            self.assertEqual(self.prune(domains), (domains, []))
+        kept, dead = self.prune(domains)
+        self.assertEqual(kept, ["alive.adobe.com", "empty.adobe.com", "silent.adobe.com"])
+        self.assertEqual(dead, ["gone.adobe.com"])
+
+        # 无法判断的结果（包括存在但没有A记录的域名）不计入失效次数
+        cache = load_prune_cache(self.cache_path)
+        self.assertEqual(cache["empty.adobe.com"]["dead_runs"], 0)
+        self.assertEqual(cache["silent.adobe.com"]["dead_runs"], 0)
+        self.assertEqual(cache["alive.adobe.com"]["dead_runs"], 0)
+
+    def test_alive_resets_dead_runs(self):
+        self.server.records["flaky.adobe.com"] = "nxdomain"
+        self.prune(["flaky.adobe.com"])
+        self.prune(["flaky.adobe.com"])
+        self.server.records["flaky.adobe.com"] = "alive"
+        self.prune(["flaky.adobe.com"])
+        self.server.records["flaky.adobe.com"] = "nxdomain"
+        self.assertEqual(self.prune(["flaky.adobe.com"]), (["flaky.adobe.com"], []))
+
+    def test_ttl_cache(self):
+        domains = ["alive.adobe.com", "gone.adobe.com"]
+        self.prune(domains, ttl=3600)
+        self.assertEqual(sorted(self.server.queries), sorted(domains))
+        # 缓存有效期内不重复解析，失效次数也不增加
+        self.prune(domains, ttl=3600)
+        self.prune(domains, ttl=3600)
+        self.assertEqual(len(self.server.queries), 2)
+        self.assertEqual(load_prune_cache(self.cache_path)["gone.adobe.com"]["dead_runs"], 1)
+        # 缓存过期后重新解析
+        self.prune(domains, ttl=0)
+        self.assertEqual(len(self.server.queries), 4)
+
+if __name__ == "__main__":
+    unittest.main()
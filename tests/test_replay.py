@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""规则回放的测试，索引匹配的结果与逐条线性匹配对比"""
+
+import random
+import unittest
+
+from clash_verge_replay import parse_rule, extract_host, RuleMatcher, replay_lines
+
+LABELS = ["a", "b", "ab", "adobe", "com", "ba"]
+
+def linear_match(rules, host):
+    """按Clash的语义逐条匹配，返回第一条命中规则的索引"""
+    for index, rule in enumerate(rules):
+        rule_type, payload, _ = parse_rule(rule)
+        payload = payload.lower()
+        if rule_type == "DOMAIN" and host == payload:
+            return index
+        if rule_type == "DOMAIN-SUFFIX" and (host == payload or host.endswith("." + payload)):
+            return index
+        if rule_type == "DOMAIN-KEYWORD" and payload in host:
+            return index
+        if rule_type in ("MATCH", "FINAL"):
+            return index
+    return None
+
+def random_host(rng):
+    return ".".join(rng.choice(LABELS) for _ in range(rng.randint(1, 3)))
+
+def random_rule(rng):
+    rule_type = rng.choice(["DOMAIN", "DOMAIN-SUFFIX", "DOMAIN-SUFFIX", "DOMAIN-KEYWORD", "IP-CIDR", "MATCH"])
+    if rule_type == "MATCH":
+        return "MATCH,DIRECT"
+    if rule_type == "IP-CIDR":
+        return "IP-CIDR,10.0.0.0/8,DIRECT"
+    if rule_type == "DOMAIN-KEYWORD":
+        return f"DOMAIN-KEYWORD,{rng.choice(LABELS)},REJECT"
+    return f"{rule_type},{random_host(rng).upper() if rng.random() < 0.2 else random_host(rng)},REJECT"
+
+class RuleMatcherTest(unittest.TestCase):
+    def test_matches_linear_first_match(self):
+        rng = random.Random(20261019)
+        for _ in range(300):
+            rules = [random_rule(rng) for _ in range(rng.randint(0, 12))]
+            matcher = RuleMatcher(rules)
+            for _ in range(30):
+                host = random_host(rng)
+                with self.subTest(rules=rules, host=host):
+                    self.assertEqual(matcher.match(host), linear_match(rules, host))
+
+    def test_suffix_does_not_match_partial_label(self):
+        matcher = RuleMatcher(["DOMAIN-SUFFIX,adobe.com,REJECT"])
+        self.assertEqual(matcher.match("adobe.com"), 0)
+        self.assertEqual(matcher.match("activate.adobe.com"), 0)
+        self.assertIsNone(matcher.match("notadobe.com"))
+
+class ExtractHostTest(unittest.TestCase):
+    def test_connection_log_lines(self):
+        lines = {
+            "[TCP] 127.0.0.1:50000 --> activate.adobe.com:443 match DomainSuffix(adobe.com) using REJECT":
+                "activate.adobe.com",
+            "time=\"2026-10-19T10:00:00Z\" level=info msg=\"[TCP] 127.0.0.1:50001 --> Example.COM:80 "
+            "match Match using DIRECT\"": "example.com",
+            "[UDP] 127.0.0.1:50002 --> [2001:db8::1]:443 doesn't match any rule using DIRECT": "2001:db8::1",
+            "[TCP] 127.0.0.1:50003 --> ereg.adobe.com. match DomainSuffix(adobe.com)": "ereg.adobe.com",
+        }
+        for line, host in lines.items():
+            with self.subTest(line=line):
+                self.assertEqual(extract_host(line), host)
+
+    def test_host_lines(self):
+        self.assertEqual(extract_host("  lm.licenses.adobe.com  \n"), "lm.licenses.adobe.com")
+        self.assertEqual(extract_host("ereg.adobe.com:443"), "ereg.adobe.com")
+        self.assertIsNone(extract_host("# comment"))
+        self.assertIsNone(extract_host(""))
+
+class ReplayLinesTest(unittest.TestCase):
+    def test_counts(self):
+        tool_rules = ["DOMAIN-SUFFIX,activate.adobe.com,REJECT", "DOMAIN-SUFFIX,ereg.adobe.com,REJECT",
+                      "DOMAIN,unused.adobe.com,REJECT"]
+        user_rules = ["DOMAIN-KEYWORD,google,DIRECT"]
+        lines = [
+            "[TCP] 127.0.0.1:50000 --> activate.adobe.com:443 match DomainSuffix(activate.adobe.com) using REJECT",
+            "[TCP] 127.0.0.1:50001 --> activate.adobe.com:443 match DomainSuffix(activate.adobe.com) using REJECT",
+            "ereg.adobe.com",
+            "www.google.com:443",
+            "example.com",
+            "lcs-cops.adobe.io",
+            "not a log line",
+        ]
+        report = replay_lines(lines, tool_rules, user_rules, batch_size=3)
+
+        self.assertEqual(report.hits, [2, 1, 0, 1])
+        self.assertEqual(report.lookups, 6)
+        self.assertEqual(report.unmatched, 2)
+        self.assertEqual(report.skipped_lines, 1)
+        # 命中第i条规则比较i+1次，未命中时比较全部4条
+        self.assertEqual(report.comparisons, 2 * 1 + 1 * 2 + 1 * 4 + 2 * 4)
+        self.assertEqual(len(report.unique_hosts), 5)
+        self.assertEqual(report.dead_tool_rules(), ["DOMAIN,unused.adobe.com,REJECT"])
+        self.assertEqual(dict(report.unmatched_vendor_hosts), {"lcs-cops.adobe.io": 1})
+
+if __name__ == "__main__":
+    unittest.main()
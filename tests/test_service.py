@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""本地服务参数检查的测试"""
+
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from clash_verge_core import emit_event, EVENT_MIRROR_STARTED, EVENT_MIRROR_FAILED, EVENT_DOMAINS_PARSED
+from clash_verge_adobe_block import GITHUB_PROXIES
+from clash_verge_service import (
+    ClashVergeService,
+    ServiceState,
+    ServiceError,
+    call_service,
+    service_available,
+    get_service_socket_path,
+    RPC_INVALID_PARAMS,
+    RPC_METHOD_NOT_FOUND
+)
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "需要Unix域套接字")
+class ServiceParamsTest(unittest.TestCase):
+    def setUp(self):
+        self.home = Path(tempfile.mkdtemp())
+        self.profiles = self.home / ".config" / "clash-verge" / "profiles"
+        self.profiles.mkdir(parents=True)
+        (self.profiles / "Script.js").write_text("function main(config) { return config; }\n", encoding='utf-8')
+        (self.home / "outside.bak.20240101000000").write_text("stolen\n", encoding='utf-8')
+        patcher = mock.patch.dict(os.environ, {"HOME": str(self.home)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.socket_path = self.home / "service.sock"
+        self.server = ClashVergeService(self.socket_path)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.home)
+
+    def call(self, method, params):
+        return call_service(method, params, socket_path=self.socket_path, timeout=10)
+
+    def assert_invalid(self, method, params, code=RPC_INVALID_PARAMS):
+        with self.assertRaises(ServiceError) as cm:
+            self.call(method, params)
+        self.assertEqual(cm.exception.code, code)
+
+    def test_invalid_params(self):
+        self.assert_invalid("status", {"unknown": 1})
+        self.assert_invalid("query", {})
+        self.assert_invalid("query", {"domain": 1})
+        self.assert_invalid("restore", {"index": "1"})
+        self.assert_invalid("restore", {"index": True})
+        self.assert_invalid("apply", {"domains": ["a.adobe.com", 1]})
+        self.assert_invalid("apply", {"rules_path": str(self.home / "missing.json")})
+        self.assert_invalid("status", [1])
+        self.assert_invalid("nothing", {}, RPC_METHOD_NOT_FOUND)
+
+    def test_restore_rejects_paths(self):
+        self.assert_invalid("restore", {"name": "../../outside.bak.20240101000000"})
+        self.assertEqual((self.profiles / "Script.js").read_text(encoding='utf-8'),
+                         "function main(config) { return config; }\n")
+
+    def test_valid_calls(self):
+        self.assertEqual(self.call("query", {"domain": "activate.adobe.com"})["vendor"], "adobe")
+        result = self.call("apply", {"domains": ["activate.adobe.com"]})
+        self.assertTrue(result["success"])
+        backups = self.call("list", {})
+        self.assertEqual(len(backups), 1)
+        self.assertTrue(self.call("restore", {"name": backups[0]["name"]})["success"])
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "需要Unix域套接字")
+class ServiceSocketTest(unittest.TestCase):
+    def setUp(self):
+        self.home = Path(tempfile.mkdtemp())
+        (self.home / ".config" / "clash-verge" / "profiles").mkdir(parents=True)
+        patcher = mock.patch.dict(os.environ, {"HOME": str(self.home)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.home)
+
+        self.server = ClashVergeService()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_default_socket_path(self):
+        path = get_service_socket_path()
+        self.assertEqual(path.parent.parent, self.home / ".config" / "clash-verge")
+        self.assertEqual(stat.S_IMODE(path.parent.stat().st_mode), 0o700)
+        self.assertEqual(stat.S_IMODE(path.stat().st_mode) & 0o077, 0)
+        self.assertTrue(service_available())
+        self.assertIn("pid", call_service("status", timeout=10))
+
+    def test_rejects_socket_of_other_user(self):
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            with self.assertRaises(ServiceError):
+                call_service("status", timeout=10)
+            self.assertFalse(service_available())
+
+class ServiceStateTest(unittest.TestCase):
+    def test_mirror_without_domains_is_ranked_last(self):
+        state = ServiceState()
+        empty, good = GITHUB_PROXIES[0], GITHUB_PROXIES[1]
+        handler = state.track_mirror(None)
+        for proxy, count in ((empty, 0), (good, 1)):
+            emit_event(handler, EVENT_MIRROR_STARTED, proxy=proxy, url=proxy + "/list")
+            emit_event(handler, EVENT_DOMAINS_PARSED, url=proxy + "/list", count=count)
+            if not count:
+                emit_event(handler, EVENT_MIRROR_FAILED, proxy=proxy, url=proxy + "/list", error="empty")
+        self.assertFalse(state.get_mirrors()[empty]["ok"])
+        self.assertEqual(state.ordered_proxies()[0], good)
+        self.assertEqual(state.ordered_proxies()[-1], empty)
+
+    def test_concurrent_refresh_downloads_once(self):
+        calls = []
+
+        def download(domain_filter, on_event, proxies=None):
+            calls.append(proxies)
+            time.sleep(0.2)
+            return {"adobe": ["activate.adobe.com"]}
+
+        state = ServiceState()
+        results = []
+        with mock.patch("clash_verge_service.download_vendor_block_lists", download):
+            threads = [threading.Thread(target=lambda: results.append(
+                state.get_vendor_domains(None, None, True, None))) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"adobe": ["activate.adobe.com"]}] * 2)
+
+if __name__ == "__main__":
+    unittest.main()
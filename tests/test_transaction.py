@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""脚本原子替换、回滚和修改锁的测试"""
+
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from clash_verge_core import (
+    CancelToken,
+    OperationCancelled,
+    ScriptLockTimeout,
+    load_journal,
+    journal_matches,
+    replace_script,
+    rollback_script,
+    script_lock,
+    get_previous_path,
+    SCRIPT_JOURNAL_NAME
+)
+
+# 在子进程中持有修改锁，直到标准输入关闭
+HOLD_LOCK = """
+import sys
+from clash_verge_core import script_lock
+with script_lock(sys.argv[1]):
+    print("locked", flush=True)
+    sys.stdin.read()
+"""
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+class ReplaceScriptTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.script = self.directory / "Script.js"
+
+    def test_new_file(self):
+        self.assertIsNone(replace_script(self.script, "first\n"))
+        self.assertEqual(self.script.read_text(encoding='utf-8'), "first\n")
+        self.assertFalse(get_previous_path(self.script).exists())
+        journal = load_journal(self.directory)
+        self.assertEqual(journal["target"], "Script.js")
+        self.assertIsNone(journal["previous"])
+
+    def test_replace_keeps_previous_version(self):
+        self.script.write_text("old\n", encoding='utf-8')
+        os.chmod(str(self.script), 0o600)
+        previous = replace_script(self.script, "new\n")
+
+        self.assertEqual(previous, get_previous_path(self.script))
+        self.assertEqual(previous.read_text(encoding='utf-8'), "old\n")
+        self.assertEqual(self.script.read_text(encoding='utf-8'), "new\n")
+        self.assertEqual(stat.S_IMODE(self.script.stat().st_mode), 0o600)
+        self.assertEqual([p.name for p in self.directory.iterdir() if p.name.endswith(".tmp")], [])
+
+        journal = load_journal(self.directory)
+        self.assertEqual(journal["previous"], previous.name)
+        st = self.script.stat()
+        self.assertEqual((journal["inode"], journal["size"], journal["mtime_ns"]),
+                         (st.st_ino, st.st_size, st.st_mtime_ns))
+        self.assertTrue(journal_matches(journal, self.script))
+
+    def test_bytes_and_newline(self):
+        replace_script(self.script, b"a\r\nb\r\n")
+        self.assertEqual(self.script.read_bytes(), b"a\r\nb\r\n")
+        replace_script(self.script, "c\r\nd\n", newline='')
+        self.assertEqual(self.script.read_bytes(), b"c\r\nd\n")
+        self.assertEqual(get_previous_path(self.script).read_bytes(), b"a\r\nb\r\n")
+
+class RollbackScriptTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.script = self.directory / "Script.js"
+        self.script.write_text("original\n", encoding='utf-8')
+
+    def test_without_journal(self):
+        self.assertEqual(rollback_script(self.directory), (False, "没有可回滚的上一版本"))
+        self.assertEqual(self.script.read_text(encoding='utf-8'), "original\n")
+
+    def test_undo_and_redo(self):
+        replace_script(self.script, "modified\n")
+        previous = get_previous_path(self.script)
+
+        success, _ = rollback_script(self.directory)
+        self.assertTrue(success)
+        self.assertEqual(self.script.read_text(encoding='utf-8'), "original\n")
+        self.assertEqual(previous.read_text(encoding='utf-8'), "modified\n")
+        self.assertTrue(journal_matches(load_journal(self.directory), self.script))
+
+        success, _ = rollback_script(self.directory)
+        self.assertTrue(success)
+        self.assertEqual(self.script.read_text(encoding='utf-8'), "modified\n")
+        self.assertEqual(previous.read_text(encoding='utf-8'), "original\n")
+        self.assertEqual([p.name for p in self.directory.iterdir() if p.name.startswith(".")], [])
+
+    def test_refuses_after_outside_edit(self):
+        replace_script(self.script, "modified\n")
+        self.script.write_text("edited by another program\n", encoding='utf-8')
+
+        success, message = rollback_script(self.directory)
+        self.assertFalse(success)
+        self.assertIn("已被其他程序更改", message)
+        self.assertEqual(self.script.read_text(encoding='utf-8'), "edited by another program\n")
+        self.assertEqual(get_previous_path(self.script).read_text(encoding='utf-8'), "original\n")
+
+    def test_missing_previous_version(self):
+        replace_script(self.script, "modified\n")
+        get_previous_path(self.script).unlink()
+        success, _ = rollback_script(self.directory)
+        self.assertFalse(success)
+        self.assertEqual(self.script.read_text(encoding='utf-8'), "modified\n")
+
+    def test_corrupt_journal(self):
+        replace_script(self.script, "modified\n")
+        (self.directory / SCRIPT_JOURNAL_NAME).write_text("{", encoding='utf-8')
+        self.assertEqual(rollback_script(self.directory), (False, "没有可回滚的上一版本"))
+
+class ScriptLockTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def hold_in_thread(self):
+        """在另一个线程中持有锁，返回释放锁的Event"""
+        locked = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            with script_lock(self.directory):
+                locked.set()
+                release.wait(10)
+
+        thread = threading.Thread(target=hold, daemon=True)
+        thread.start()
+        self.assertTrue(locked.wait(5))
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(release.set)
+        return release
+
+    def test_timeout_while_held_by_thread(self):
+        self.hold_in_thread()
+        started = time.monotonic()
+        with self.assertRaises(ScriptLockTimeout):
+            with script_lock(self.directory, timeout=0.3):
+                pass
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+
+    def test_waiter_acquires_after_release(self):
+        release = self.hold_in_thread()
+        threading.Timer(0.3, release.set).start()
+        started = time.monotonic()
+        with script_lock(self.directory, timeout=5):
+            waited = time.monotonic() - started
+        self.assertGreaterEqual(waited, 0.2)
+        self.assertLess(waited, 5)
+
+    def test_cancel_while_waiting(self):
+        self.hold_in_thread()
+        token = CancelToken()
+        threading.Timer(0.2, token.cancel).start()
+        with self.assertRaises(OperationCancelled):
+            with script_lock(self.directory, timeout=5, cancel_token=token):
+                pass
+
+    def test_held_by_other_process(self):
+        env = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+        child = subprocess.Popen([sys.executable, "-c", HOLD_LOCK, str(self.directory)],
+                                 stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env)
+        self.addCleanup(child.wait, 10)
+        try:
+            self.assertEqual(child.stdout.readline().strip(), b"locked")
+            with self.assertRaises(ScriptLockTimeout):
+                with script_lock(self.directory, timeout=0.3):
+                    pass
+        finally:
+            child.stdin.close()
+            child.stdout.close()
+        child.wait(10)
+        with script_lock(self.directory, timeout=5):
+            pass
+
+if __name__ == "__main__":
+    unittest.main()